@@ -0,0 +1,66 @@
+import re
+
+
+# Answers shorter than this always get a follow-up
+MIN_WORDS = 30
+# Scores at or above this are detailed enough
+HIGH_SCORE = 0.6
+# Clearly thin only when short and without a single cue, number, name or feeling;
+# plain 40-60 word answers score the same whether vague or concrete, so the LLM decides
+THIN_WORDS = 40
+LOW_SCORE = 0.1
+
+SPECIFICITY_CUES = (
+    "for example", "for instance", "such as", "because", "when i", "i remember",
+    "last year", "last week", "once", "specifically", "in particular", "the time",
+)
+
+EMOTION_WORDS = {
+    "love", "loved", "hate", "hated", "happy", "sad", "angry", "afraid", "scared",
+    "proud", "grateful", "excited", "anxious", "nervous", "lonely", "joy", "fear",
+    "calm", "peaceful", "frustrated", "inspired", "hurt", "miss", "missed",
+    "enjoy", "enjoyed", "felt", "feel", "feeling", "overwhelmed", "relieved",
+}
+
+
+def score_answer(text):
+    """Returns the local quality signals of an answer and their combined 0-1 score"""
+    words = text.split()
+    lowered = text.lower()
+    lowered_words = re.findall(r"[a-z']+", lowered)
+
+    cues = sum(lowered.count(cue) for cue in SPECIFICITY_CUES)
+    numbers = len(re.findall(r"\b\d+\b", text))
+    # Capitalized words that do not start a sentence are a cheap proxy for names
+    entities = len(re.findall(r"(?<![.!?]\s)(?<!^)\b(?!I\b)[A-Z][a-z]+", text))
+    emotions = sum(1 for word in lowered_words if word in EMOTION_WORDS)
+
+    score = (
+        0.35 * min(len(words) / 150, 1.0)
+        + 0.25 * min(cues / 3, 1.0)
+        + 0.2 * min((numbers + entities) / 4, 1.0)
+        + 0.2 * min(emotions / 3, 1.0)
+    )
+    return {
+        "words": len(words),
+        "cues": cues,
+        "numbers": numbers,
+        "entities": entities,
+        "emotions": emotions,
+        "score": round(score, 3),
+    }
+
+
+def assess_answer(text):
+    """
+    Decides locally whether an answer needs a follow-up: True or False for
+    clear cases, None when it is ambiguous and should go to the LLM.
+    """
+    signals = score_answer(text)
+    if signals["words"] < MIN_WORDS:
+        return True
+    if signals["score"] >= HIGH_SCORE:
+        return False
+    if signals["score"] <= LOW_SCORE and signals["words"] < THIN_WORDS:
+        return True
+    return None
@@ -1,25 +1,28 @@
 import streamlit as st
-from interview_agent import InterviewAgent
 import json
-from openai import OpenAI
+import uuid
 # from u_profile import generate_user_profile, clean_profile, save_profile
-from u_profile import generate_full_profile_by_phase, save_profile
-import firebase_admin
-from firebase_admin import credentials, firestore
-from twin import generate_recommendations, load_user_profile
+from twin import stream_recommendations, load_user_profile
+from profile_cache import invalidate_profile, watch_profile
+from journal import USER_ID_PATTERN, InterviewJournal, journal_path
+from resources import get_firestore, get_openai_key, get_secrets
+from tracing import render_sidebar_panel
 import time
 
 # fetching openai key 
-openai_key = st.secrets["api"]["key"]
+openai_key = get_openai_key()
 
-# Convert Streamlit secrets into dict
-firebase_config = st.secrets["firebase"]
-# setting up firebase
-cred = credentials.Certificate(dict(firebase_config))
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
+# Using the shared Firestore client
+db = get_firestore()
 
-db = firestore.client()
+# Binding the session to a user; the ID is kept in the URL so a reload resumes it
+if "user_id" not in st.session_state:
+    user_id = st.query_params.get("uid", "")
+    if not USER_ID_PATTERN.match(user_id):
+        user_id = uuid.uuid4().hex
+        st.query_params["uid"] = user_id
+    st.session_state.user_id = user_id
+user_id = st.session_state.user_id
 
 
 
@@ -31,11 +34,6 @@ db = firestore.client()
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "interview_agent" not in st.session_state:
-    st.session_state.interview_agent = InterviewAgent(openai_key)
-    st.session_state.follow_up_count = 0
-    st.session_state.conversation_saved = False  
-
 # Custom CSS
 # st.markdown("""<style>
 #     .stChatInput textarea { min-height: 150px; }
@@ -46,8 +44,9 @@ if "interview_agent" not in st.session_state:
 # Displaying title
 st.markdown('<h1 class="title" style="text-align: center; font-size: 80px; color: #E041B1;">Prism</h1>', unsafe_allow_html=True)
 
-# Loading user profile if avaialble
-profile = load_user_profile()
+# Loading user profile if avaialble, kept fresh by a snapshot listener
+watch_profile(db, doc_id=user_id)
+profile = load_user_profile(user_id)
 
 # Defining Sidebar
 with st.sidebar:
@@ -79,44 +78,55 @@ with st.sidebar:
     
     # Button to trigger profile download
     if st.button("Profile"):
-        # Fetching the profile data from database
-        doc_ref = db.collection("profiles").document("current_user")
-        doc = doc_ref.get()
-
-        if doc.exists:
-            profile_data = doc.to_dict()  
-
-            # Saving the profile data as a .txt file 
-            profile_filename = "profile.txt"
-            with open(profile_filename, 'w') as f:
-                # Writing the profile data as text 
-                f.write(json.dumps(profile_data, indent=4))  
-
-            # Triggering the file download
-            with open(profile_filename, "rb") as file:
-                st.download_button(
-                    label="Downloading Profile...",
-                    data=file,
-                    file_name="profile.txt",
-                    mime="text/plain",
-                    
-                )
+        # Using the cached profile data instead of another database read
+        if profile:
+            # Triggering the file download straight from memory, as sessions share the working directory
+            st.download_button(
+                label="Downloading Profile...",
+                data=json.dumps(profile, indent=4),
+                file_name="profile.txt",
+                mime="text/plain",
+            )
         else:
             st.error("Take the interview first!")
 
+    # Showing per-call latency and token usage when enabled in secrets
+    if get_secrets().get("tracing", {}).get("sidebar", False):
+        render_sidebar_panel()
+
 
     if st.button("Interview Agent"):
     # fetching user profile from database for deleting
-        doc_ref = db.collection("profiles").document("current_user")
+        doc_ref = db.collection("profiles").document(user_id)
 
         # Deleting the document
         doc_ref.delete()
+        invalidate_profile(doc_id=user_id)
+
+        # Starting the retake from a fresh interview
+        from jobs import profile_jobs
+        profile_jobs.discard(user_id)
+        if "interview_agent" in st.session_state:
+            st.session_state.interview_agent.journal.close()
+            st.session_state.conversation_writer.close()
+            del st.session_state["interview_agent"]
+        st.session_state.pop("profile_job", None)
+        # Deleting the journal file also when this session never loaded the interview
+        InterviewJournal(journal_path(user_id)).reset()
+        st.session_state.messages = []
         st.rerun()
 
 
 
 
 if profile:
+    # The interview that produced the profile is no longer needed in this session
+    if "interview_agent" in st.session_state:
+        st.session_state.interview_agent.journal.close()
+        st.session_state.conversation_writer.close()
+        del st.session_state["interview_agent"]
+    st.session_state.pop("profile_job", None)
+
     # Defining digital twin layout
     # st.markdown('<h1 class="title" style="text-align: center; font-size: 80px; color: #E041B1;">Prism</h1>', unsafe_allow_html=True)
     st.markdown('<p style="text-align: center; font-size: 18px;">Lets Prism to get personalized recommendations</p>', unsafe_allow_html=True)
@@ -125,18 +135,22 @@ if profile:
 
     query = st.text_input('Write Your Query....')
     if st.button('Lets Prism'):
-        recs = generate_recommendations(profile, query)
-
-        st.markdown(
-        f"""
-        <div style="background-color: #2e2e2e; padding: 1em; border-radius: 8px;">
-            <div style="background-color: #f0f0f0; color: #000; padding: 1em; border-radius: 8px;">
-                {recs}
+        # Rendering the recommendations progressively as they stream in
+        recs_placeholder = st.empty()
+        recs = ""
+        for chunk in stream_recommendations(profile, query):
+            recs += chunk
+
+            recs_placeholder.markdown(
+            f"""
+            <div style="background-color: #2e2e2e; padding: 1em; border-radius: 8px;">
+                <div style="background-color: #f0f0f0; color: #000; padding: 1em; border-radius: 8px;">
+                    {recs}
+                </div>
             </div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+            """,
+            unsafe_allow_html=True
+        )
 
     
 
@@ -148,6 +162,41 @@ if profile:
 
 # if profile == None:
 else:
+    # Loading the interview stack only when the interview is shown
+    from interview_agent import InterviewAgent
+    from conversation_store import ConversationWriter
+    from jobs import profile_jobs
+
+    # Initializing interview session state
+    if "interview_agent" not in st.session_state:
+        agent = InterviewAgent(openai_key, journal_path=journal_path(user_id))
+        st.session_state.conversation_saved = False  
+        # Summarizes each phase in the background once its questions are done,
+        # shared with the profile job so a page reload does not lose its work
+        st.session_state.profile_builder = profile_jobs.builder(user_id)
+        # Writes answers to Firestore in batches off the script thread
+        st.session_state.conversation_writer = ConversationWriter(db, doc_id=user_id)
+
+        # Resuming an interrupted interview from its journal
+        if agent.resume():
+            last_question = None
+            for entry in agent.conversation:
+                if entry["question"] != last_question:
+                    st.session_state.messages.append({"role": "assistant", "content": entry["question"]})
+                    last_question = entry["question"]
+                st.session_state.messages.append({"role": "user", "content": entry["answer"]})
+
+            for index, entry in enumerate(agent.conversation):
+                st.session_state.conversation_writer.append(index, entry)
+
+            for phase in agent.phases[:agent.current_phase]:
+                st.session_state.profile_builder.submit_phase(
+                    phase["name"],
+                    [entry for entry in agent.conversation if entry["phase"] == phase["name"]]
+                )
+
+        st.session_state.interview_agent = agent
+
     # Defining main interview agent UI
     
     st.markdown('<p style="text-align: center; font-size: 18px;">Create your digital twin and get personalized recommendations</p>', unsafe_allow_html=True)
@@ -171,75 +220,99 @@ else:
                 st.session_state.messages.append({"role": "assistant", "content": current_q})
                 st.rerun()
 
-            # Getting user response
-            # unique_key = str(time.time())
-            # user_input = st.text_input(label='Input text..' , placeholder = "Type your answer here..." , key=unique_key)
-            user_input = st.chat_input(placeholder='Type your answer here')
+            # An answer journaled before a reload but not yet followed up on is
+            # picked up again instead of asking the question a second time
+            answers = sum(1 for entry in agent.conversation if entry["question"] == current_q)
+            if agent.question_answered and answers > agent.follow_up_depth:
+                agent.question_answered = False
+                user_input = agent.conversation[-1]["answer"]
+            else:
+                # Getting user response
+                # unique_key = str(time.time())
+                # user_input = st.text_input(label='Input text..' , placeholder = "Type your answer here..." , key=unique_key)
+                user_input = st.chat_input(placeholder='Type your answer here')
+                if user_input:
+                    st.session_state.messages.append({"role": "user", "content": user_input})
+
+                    # Storing response
+                    entry = agent.record_answer(current_q, user_input, current_phase["name"])
+                    st.session_state.conversation_writer.append(len(agent.conversation) - 1, entry)
+
             if user_input:
-                st.session_state.messages.append({"role": "user", "content": user_input})
-            
-                # Storing response
-                agent.conversation.append({
-                    "question": current_q,
-                    "answer": user_input,
-                    "phase": current_phase["name"]
-                })
-                
-                # Checking response quality
-                if agent._needs_elaboration(user_input):
-                    if st.session_state.follow_up_count < 2:
-                        follow_up = agent._generate_follow_up(current_q, user_input)
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "content": f"Follow-up: {follow_up}"
-                        })
-                        st.session_state.follow_up_count += 1
-                    else:
-                        agent.current_question += 1
-                        st.session_state.follow_up_count = 0
+                # Checking response quality and getting a follow-up in one round-trip
+                follow_up = None
+                if agent.follow_up_depth < 2:
+                    follow_up = agent.next_follow_up(current_q, user_input)
+
+                if follow_up:
+                    st.session_state.messages.append({
+                        "role": "assistant", 
+                        "content": f"Follow-up: {follow_up}"
+                    })
+                    agent.follow_up_depth += 1
                 else:
                     agent.current_question += 1
-                    st.session_state.follow_up_count = 0
+                    agent.follow_up_depth = 0
 
                 # Saving progress and rerun
                 agent._save_progress()
                 st.rerun()
         else:
+            # Handing the finished phase to the background profile builder
+            st.session_state.profile_builder.submit_phase(
+                current_phase["name"],
+                [entry for entry in agent.conversation if entry["phase"] == current_phase["name"]]
+            )
+
             # Moving to next phase
             agent.current_phase += 1
             agent.current_question = 0
+            agent._save_progress()
             st.rerun()
     else:
         if not st.session_state.get("conversation_saved", False):
-        # Saving entire conversation to Firebase database
-            conversation_data = agent.conversation 
-            db.collection("conversations").document("full_conversation").set({"conversation": conversation_data})
-
-            st.session_state.conversation_saved = True
-            st.rerun()
+        # Waiting for the last queued answers to reach Firebase database
+            if st.session_state.conversation_writer.flush():
+                # Nothing is written after the interview, so its thread can stop
+                st.session_state.conversation_writer.close()
+                st.session_state.conversation_saved = True
+                st.rerun()
+            else:
+                # Failed entries stay queued, so retrying only writes what is missing
+                st.error("Saving the conversation failed.")
+                if st.button("Retry saving"):
+                    st.rerun()
 
 
         # Generating the profile
         if st.session_state.get("conversation_saved", False):
-            with st.spinner('User profile is being created...'):
-                # Fetching the conversation from Firebase
-                doc_ref = db.collection("conversations").document("full_conversation")
-                doc = doc_ref.get()
-
-                if doc.exists:
-                    interview_data = doc.to_dict().get("conversation")
-                    print("Loaded conversation from Firebase")
-                else:
-                    print("No conversation found in Firebase")
-                    interview_data = {}
-
-                # Generating and cleaning the profile
-                cleaned_profile = generate_full_profile_by_phase(interview_data)
-                # profile = generate_user_profile(interview_data)
-                # cleaned_profile = clean_profile(profile)
-
-                # Saving the profile to Firebase
-                save_profile(cleaned_profile)
+            # Building and saving the profile in a background job, at most one per user,
+            # using the conversation already in memory. The session keeps its job, since
+            # the registry forgets a job once its profile is saved
+            job = (st.session_state.get("profile_job") or profile_jobs.get(user_id)
+                   or profile_jobs.start(user_id, agent.conversation))
+            st.session_state.profile_job = job
+
+            if job.status == "running":
+                # Polling the job's progress instead of blocking the script thread
+                st.progress(job.fraction, text=f"User profile is being created... "
+                                               f"({job.done}/{job.total or '?'} parts summarized)")
+                time.sleep(1)
+                st.rerun()
+            elif job.status == "failed":
+                # Finished chunks are checkpointed, so retrying only redoes the failed ones
+                st.error(f"Profile generation failed: {job.error}")
+                if st.button("Retry"):
+                    st.session_state.profile_job = profile_jobs.start(user_id, agent.conversation)
+                    st.rerun()
+            elif job.status == "cancelled":
+                # The retake deleted this interview's journal, so a new session starts over
+                st.warning("The interview was restarted in another session. Reload the page to start again.")
+            else:
+                # The job has already dropped the user's journal and builder
+                agent.journal.close()
+                del st.session_state["interview_agent"]
+                del st.session_state["profile_job"]
 
                 st.success("Interview complete! User Profile generated and saved!")
                 st.rerun()
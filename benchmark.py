@@ -0,0 +1,211 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import resources
+import search
+from cache import TTLCache
+from fakes import FakeChatOpenAI, FakeFirestore, FakeOpenAI, FakeSearchBackend, Latency
+from tracing import percentile
+
+
+# Offline benchmarks of the app's hot paths against local stand-ins.
+# Usage: python benchmark.py --runs 5 --output bench.json
+
+SAMPLE_SENTENCES = [
+    "I grew up in a small town and spent most weekends hiking with my family.",
+    "Honestly I am not sure.",
+    "For example, when I moved to Berlin in 2019 I felt lonely but excited.",
+    "I love cooking spicy food for friends because it brings everyone together.",
+    "Reading science fiction helps me think about the future in a calmer way.",
+    "It depends on my mood.",
+    "Travel to me means slowing down, sitting in cafes and watching people.",
+]
+
+
+def synthetic_answer(rng):
+    """Builds an answer of random length from the sample sentences"""
+    return " ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(1, 8)))
+
+
+def synthetic_interview(phases, answers, seed=0):
+    """Builds an interview of the given number of answers spread over the real phases"""
+    rng = random.Random(seed)
+    questions = [(phase["name"], question) for phase in phases for question in phase["questions"]]
+    return [
+        {"question": question, "answer": synthetic_answer(rng), "phase": phase}
+        for phase, question in (questions[i % len(questions)] for i in range(answers))
+    ]
+
+
+def summarize(name, timings, **extra):
+    """Returns timing statistics in milliseconds"""
+    timings_ms = sorted(t * 1000 for t in timings)
+    return dict({
+        "name": name,
+        "runs": len(timings_ms),
+        "mean_ms": round(statistics.mean(timings_ms), 2),
+        "p50_ms": round(statistics.median(timings_ms), 2),
+        "p95_ms": round(percentile(timings_ms, 0.95), 2),
+        "min_ms": round(timings_ms[0], 2),
+        "max_ms": round(timings_ms[-1], 2),
+    }, **extra)
+
+
+def bench_interview_turn(chat_llm, runs, seed):
+    """Times one interview turn, both as two separate calls and through next_follow_up"""
+    from interview_agent import InterviewAgent
+
+    rng = random.Random(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = InterviewAgent("offline", journal_path=os.path.join(tmp, "journal.jsonl"))
+        question = agent.phases[0]["questions"][0]
+        answers = [synthetic_answer(rng) for _ in range(runs)]
+
+        for name, turn in (
+            ("interview_turn.two_calls",
+             lambda answer: agent._needs_elaboration(answer) and agent._generate_follow_up(question, answer)),
+            ("interview_turn.next_follow_up",
+             lambda answer: agent.next_follow_up(question, answer)),
+        ):
+            # Warming up lazy imports outside the timed runs
+            turn(answers[0])
+            calls_before = chat_llm.calls
+            timings = []
+            for answer in answers:
+                start = time.perf_counter()
+                turn(answer)
+                timings.append(time.perf_counter() - start)
+            results.append(summarize(name, timings, llm_calls=chat_llm.calls - calls_before))
+        agent.journal.close()
+    return results
+
+
+def bench_profile_generation(openai_client, sizes, runs, seed):
+    """Times generate_full_profile_by_phase on synthetic interviews of each size"""
+    from interview_agent import InterviewAgent
+    from u_profile import generate_full_profile_by_phase, set_checkpoint_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        phases = InterviewAgent("offline", journal_path=os.path.join(tmp, "journal.jsonl")).phases
+
+    results = []
+    for size in sizes:
+        data = synthetic_interview(phases, size, seed)
+        calls_before = openai_client.calls
+        timings = []
+        for _ in range(runs):
+            # Every run starts without memoized chunk summaries
+            set_checkpoint_store(TTLCache(ttl=0, max_entries=10000))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_full_profile_by_phase(data)
+            timings.append(time.perf_counter() - start)
+        results.append(summarize(
+            f"profile_generation.{size}_answers", timings,
+            llm_calls=(openai_client.calls - calls_before) // runs
+        ))
+    return results
+
+
+def bench_recommendations(openai_client, search_backend, runs, seed, user_id="bench-user"):
+    """
+    Times loading a user's profile from Firestore and generating recommendations
+    for it end to end, cold and with warm caches
+    """
+    from interview_agent import InterviewAgent
+    from recommendation_cache import recommendation_cache
+    from twin import generate_recommendations, load_user_profile
+    from u_profile import generate_full_profile_by_phase, save_profile, set_checkpoint_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        phases = InterviewAgent("offline", journal_path=os.path.join(tmp, "journal.jsonl")).phases
+    set_checkpoint_store(TTLCache(ttl=0, max_entries=10000))
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Seeding the fake Firestore with the profile the timed runs load
+        save_profile(generate_full_profile_by_phase(synthetic_interview(phases, 60, seed)), doc_id=user_id)
+
+    search_cache = TTLCache(ttl=3600, max_entries=1000)
+    search.set_search_backend(search_backend, cache=search_cache)
+    queries = ["good sci-fi books", "a quiet weekend trip", "spicy food to cook at home"]
+
+    results = []
+    for name, warm in (("recommendations.cold", False), ("recommendations.cached", True)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if warm:
+                for query in queries:
+                    generate_recommendations(load_user_profile(user_id), query)
+            calls_before = openai_client.calls
+            timings = []
+            for i in range(runs):
+                if not warm:
+                    recommendation_cache.clear()
+                    search_cache.clear()
+                start = time.perf_counter()
+                # A cold run reads the profile from Firestore instead of the profile cache
+                profile = load_user_profile(user_id, use_cache=warm)
+                generate_recommendations(profile, queries[i % len(queries)])
+                timings.append(time.perf_counter() - start)
+        results.append(summarize(name, timings, llm_calls=openai_client.calls - calls_before))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Prism's hot paths against local fakes")
+    parser.add_argument("--runs", type=int, default=5, help="repetitions per benchmark")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per web search")
+    parser.add_argument("--firestore-latency", type=float, default=0.01, help="seconds per Firestore call")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 60, 120],
+                        help="interview sizes for profile generation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    openai_client = FakeOpenAI(latency=Latency(args.llm_latency, seed=args.seed))
+    chat_llm = FakeChatOpenAI(latency=Latency(args.llm_latency, seed=args.seed))
+    firestore_client = FakeFirestore(latency=Latency(args.firestore_latency, seed=args.seed))
+    search_backend = FakeSearchBackend(latency=Latency(args.search_latency, seed=args.seed))
+    resources.use_clients(
+        openai_client=openai_client,
+        chat_llm_factory=lambda model, temperature, max_tokens: chat_llm,
+        firestore_client=firestore_client,
+    )
+
+    results = []
+    results += bench_interview_turn(chat_llm, args.runs, args.seed)
+    results += bench_profile_generation(openai_client, args.sizes, args.runs, args.seed)
+    results += bench_recommendations(openai_client, search_backend, args.runs, args.seed)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "runs": args.runs,
+            "llm_latency_s": args.llm_latency,
+            "search_latency_s": args.search_latency,
+            "firestore_latency_s": args.firestore_latency,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
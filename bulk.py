@@ -0,0 +1,148 @@
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# Bulk recommendations for offline evaluation and nightly pre-computation.
+# Input is JSONL with a query and either a profile or a user_id per line:
+#   {"id": "1", "user_id": "abc", "query": "weekend trip ideas"}
+# Usage: python bulk.py items.jsonl --output results.jsonl --concurrency 16 [--fake]
+
+
+def read_items(path):
+    """Yields the items of a JSONL file, or of stdin for '-', skipping blank lines"""
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _run_item(index, item):
+    """Generates recommendations for one item, returning a result record instead of raising"""
+    from twin import generate_recommendations, load_user_profile
+
+    result = {"id": item.get("id", index), "query": item.get("query")}
+    if "user_id" in item:
+        result["user_id"] = item["user_id"]
+    start = time.perf_counter()
+    try:
+        profile = item.get("profile")
+        if profile is None:
+            profile = load_user_profile(item["user_id"])
+        if not profile:
+            raise ValueError("No profile found")
+        result["recommendations"] = generate_recommendations(profile, item["query"])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def run_bulk(items, on_result, concurrency=8):
+    """
+    Runs generate_recommendations for every item with at most concurrency
+    items in flight, reading items lazily and passing each result to
+    on_result as soon as it is done. Returns a throughput report.
+    """
+    from search import search_cache_stats
+    from tracing import percentile
+
+    searches_before = search_cache_stats()
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+
+    def finish(futures):
+        nonlocal errors
+        for future in futures:
+            result = future.result()
+            latencies.append(result["latency_ms"])
+            errors += "error" in result
+            on_result(result)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        for index, item in enumerate(items):
+            # Bounding queued work so large inputs are not read into memory at once
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                finish(done)
+            pending.add(executor.submit(_run_item, index, item))
+        finish(wait(pending).done)
+
+    elapsed = time.perf_counter() - start
+    searches = {key: value - searches_before[key] for key, value in search_cache_stats().items()
+                if key in ("hits", "misses", "joined")}
+    return {
+        "items": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "items_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "p95_ms": percentile(latencies, 0.95),
+        # Joined searches missed the cache but waited on an identical one in flight
+        "searches_sent": searches["misses"] - searches["joined"],
+        "searches_deduplicated": searches["hits"] + searches["joined"],
+    }
+
+
+def use_fakes(llm_latency=0.05, search_latency=0.05):
+    """Swaps in the local LLM, Firestore and search stand-ins with an in-memory search cache"""
+    import resources
+    import search
+    from cache import TTLCache
+    from fakes import FakeChatOpenAI, FakeFirestore, FakeOpenAI, FakeSearchBackend, Latency
+
+    chat_llm = FakeChatOpenAI(latency=Latency(llm_latency))
+    resources.use_clients(
+        openai_client=FakeOpenAI(latency=Latency(llm_latency)),
+        chat_llm_factory=lambda model, temperature, max_tokens: chat_llm,
+        firestore_client=FakeFirestore(),
+    )
+    search.set_search_backend(
+        FakeSearchBackend(latency=Latency(search_latency)), cache=TTLCache(ttl=0, max_entries=100000)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate recommendations for many profiles and queries")
+    parser.add_argument("input", help="JSONL file of items, or - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL file for results (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="items processed at once")
+    parser.add_argument("--fake", action="store_true", help="use local LLM, Firestore and search stand-ins")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per fake web search")
+    args = parser.parse_args()
+
+    if args.fake:
+        use_fakes(args.llm_latency, args.search_latency)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    # Results are written from the main thread as they finish
+    def write(result):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+    try:
+        # Log lines printed along the way go to stderr so stdout only carries results
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_bulk(read_items(args.input), write, concurrency=max(1, args.concurrency))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    # The report goes to stderr so it does not mix with results on stdout
+    print(json.dumps(report, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from tracing import trace
+
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_SIZE = 500
+
+_CLOSE = object()
+
+
+class _FlushRequest:
+    """Asks the writer thread to write everything queued so far and report back"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+
+
+# Defining write-behind conversation writer
+class ConversationWriter:
+    """
+    Persists conversation entries to Firestore off the caller's thread. Each
+    entry becomes its own document in conversations/{doc_id}/entries, keyed by
+    its position, and queued entries are flushed together as batched writes.
+    """
+
+    def __init__(self, db, doc_id="full_conversation", collection="conversations",
+                 batch_size=20, flush_interval=2.0):
+        self.db = db
+        self.doc_ref = db.collection(collection).document(doc_id)
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE - 1)
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failures = 0
+        # Failed attempts of the batch currently being retried
+        self._retries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, index, entry):
+        """Queues the entry at position index of the conversation for writing"""
+        self._queue.put((index, dict(entry)))
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _CLOSE:
+                self._write(pending)
+                return
+
+            if isinstance(item, _FlushRequest):
+                # Write everything queued before it, failing the flush if any entry is left
+                pending = self._write(pending)
+                deadline = time.monotonic() + self.flush_interval if pending else None
+                item.ok = not pending
+                item.done.set()
+                continue
+
+            if item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                pending = self._write(pending)
+                deadline = time.monotonic() + self.flush_interval if pending else None
+
+    def _commit(self, entries):
+        """Writes entries and the entry count in one batch"""
+        with trace("firestore", "conversation.write", entries=len(entries)) as span:
+            span.retries = self._retries
+            batch = self.db.batch()
+            for index, entry in entries:
+                batch.set(self.doc_ref.collection("entries").document(f"{index:05d}"), entry)
+            count = max(index for index, _ in entries) + 1
+            batch.set(self.doc_ref, {"entry_count": count}, merge=True)
+            batch.commit()
+
+    def _write(self, pending):
+        """
+        Writes queued entries in batches of batch_size, so a backlog built up
+        by failures still fits Firestore's batch limit. Returns what is left.
+        """
+        for start in range(0, len(pending), self.batch_size):
+            entries = pending[start:start + self.batch_size]
+            try:
+                self._commit(entries)
+            except Exception as e:
+                # Keeping this and later entries queued, in order, so the next flush retries them
+                self.failures += 1
+                self._retries += 1
+                print(f"Failed to save conversation entries: {e}")
+                return pending[start:]
+            self.written += len(entries)
+            self._retries = 0
+        return []
+
+    def flush(self, timeout=30):
+        """
+        Blocks until every entry queued so far has been written. Returns False
+        if the write failed or timed out; the entries stay queued for a retry.
+        """
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout) and request.ok
+
+    def close(self, timeout=30):
+        """Writes remaining entries and stops the writer thread"""
+        self._queue.put(_CLOSE)
+        self._thread.join(timeout)
+
+
+def load_conversation(db, doc_id="full_conversation", collection="conversations"):
+    """Reads a conversation written by ConversationWriter back in order"""
+    doc_ref = db.collection(collection).document(doc_id)
+    doc = doc_ref.get()
+    if not doc.exists:
+        return []
+
+    # Entries past entry_count are left over from an earlier, longer interview
+    count = doc.to_dict().get("entry_count", 0)
+    entries = sorted(doc_ref.collection("entries").stream(), key=lambda entry: entry.id)
+    return [entry.to_dict() for entry in entries if int(entry.id) < count]
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from search import StaticSearchBackend
+
+
+# Local stand-ins for OpenAI, LangChain, Firestore and web search. They answer
+# deterministically and can inject latency, so hot paths can be timed offline.
+
+
+def _seed(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+class Latency:
+    """Sleeps for base seconds plus a deterministic jitter of up to jitter seconds"""
+
+    def __init__(self, base=0.0, jitter=0.0, seed=0):
+        self.base = base
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self.base + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fake_completion(prompt):
+    """Returns a canned reply shaped like what each prompt in the app expects"""
+    if "structured JSON summary" in prompt:
+        words = sorted(set(word.strip(".,?!\"'").lower() for word in prompt.split()[-200:]))
+        return json.dumps({
+            "background": f"Summary of {len(prompt)} characters of answers",
+            "personality_traits": words[:5],
+            "preferences": words[5:10],
+        })
+    if "Condense the following JSON" in prompt:
+        return prompt[prompt.find("{"):prompt.rfind("}") + 1]
+    if "Answer only with JSON" in prompt:
+        needed = _seed(prompt) % 2 == 0
+        return json.dumps({
+            "needs_follow_up": needed,
+            "follow_up": "Can you share a specific example?" if needed else "",
+        })
+    if "YES/NO" in prompt:
+        return "YES" if _seed(prompt) % 2 == 0 else "NO"
+    if "follow-up question" in prompt:
+        return "Follow-up: What made that moment stand out to you?"
+    return (
+        "1. [Recommendation One]\n   - Why: Matches your values\n"
+        "2. [Recommendation Two]\n   - Why: Fits your routine\n"
+        "3. [Recommendation Three]\n   - Why: Builds on your interests"
+    )
+
+
+class FakeOpenAI:
+    """Stand-in for openai.OpenAI supporting chat.completions.create, streamed or not"""
+
+    def __init__(self, latency=None, stream_chunks=20):
+        self.latency = latency or Latency()
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        prompt = messages[-1]["content"]
+        text = fake_completion(prompt)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m["content"]) for m in messages) // 4,
+            completion_tokens=len(text) // 4,
+            total_tokens=(sum(len(m["content"]) for m in messages) + len(text)) // 4,
+        )
+
+        if not stream:
+            self.latency.wait()
+            message = SimpleNamespace(content=text, role="assistant")
+            return SimpleNamespace(
+                model=model, usage=usage, choices=[SimpleNamespace(message=message, finish_reason="stop")]
+            )
+        return self._stream(model, text, usage)
+
+    def _stream(self, model, text, usage):
+        # Time to first token is the injected latency, the rest trickles in
+        self.latency.wait()
+        size = max(1, len(text) // self.stream_chunks)
+        for start in range(0, len(text), size):
+            delta = SimpleNamespace(content=text[start:start + size])
+            yield SimpleNamespace(model=model, usage=None, choices=[SimpleNamespace(delta=delta)])
+        yield SimpleNamespace(model=model, usage=usage, choices=[])
+
+
+class FakeChatOpenAI:
+    """Stand-in for LangChain's ChatOpenAI, callable with a list of messages"""
+
+    def __init__(self, model="gpt-4", latency=None):
+        self.model_name = model
+        self.latency = latency or Latency()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, messages):
+        with self._lock:
+            self.calls += 1
+        self.latency.wait()
+        text = fake_completion(messages[-1].content)
+        return SimpleNamespace(
+            content=text,
+            response_metadata={"token_usage": {
+                "prompt_tokens": len(messages[-1].content) // 4,
+                "completion_tokens": len(text) // 4,
+            }},
+        )
+
+    invoke = __call__
+
+
+# Defining in-memory Firestore
+class _FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return json.loads(json.dumps(self._data)) if self._data is not None else None
+
+
+class _FakeDocument:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return _FakeCollection(self._store, f"{self.path}/{name}")
+
+    def get(self):
+        self._store.latency.wait()
+        return _FakeSnapshot(self.id, self._store.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        self._store.latency.wait()
+        self._store.write(self.path, data, merge)
+
+    def delete(self):
+        self._store.latency.wait()
+        self._store.write(self.path, None)
+
+    def on_snapshot(self, callback):
+        return self._store.watch(self, callback)
+
+
+class _FakeCollection:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+
+    def document(self, doc_id):
+        return _FakeDocument(self._store, f"{self.path}/{doc_id}")
+
+    def stream(self):
+        self._store.latency.wait()
+        prefix = self.path + "/"
+        return [
+            _FakeSnapshot(path[len(prefix):], data)
+            for path, data in sorted(self._store.docs.items())
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        ]
+
+
+class _FakeBatch:
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def set(self, doc, data, merge=False):
+        self._writes.append((doc.path, data, merge))
+
+    def commit(self):
+        # One round-trip for the whole batch
+        self._store.latency.wait()
+        for path, data, merge in self._writes:
+            self._store.write(path, data, merge)
+
+
+class FakeFirestore:
+    """In-memory stand-in for a Firestore client"""
+
+    def __init__(self, latency=None):
+        self.latency = latency or Latency()
+        self.docs = {}
+        self.writes = 0
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+    def write(self, path, data, merge=False):
+        with self._lock:
+            self.writes += 1
+            if data is None:
+                self.docs.pop(path, None)
+            elif merge and path in self.docs:
+                self.docs[path] = dict(self.docs[path], **json.loads(json.dumps(data)))
+            else:
+                self.docs[path] = json.loads(json.dumps(data))
+            watchers = list(self._watchers.get(path, []))
+        for doc, callback in watchers:
+            callback([_FakeSnapshot(doc.id, self.docs.get(path))], [], None)
+
+    def watch(self, doc, callback):
+        with self._lock:
+            self._watchers.setdefault(doc.path, []).append((doc, callback))
+        callback([_FakeSnapshot(doc.id, self.docs.get(doc.path))], [], None)
+        return SimpleNamespace(unsubscribe=lambda: self._unwatch(doc.path, callback))
+
+    def _unwatch(self, path, callback):
+        with self._lock:
+            self._watchers[path] = [pair for pair in self._watchers.get(path, []) if pair[1] is not callback]
+
+
+class FakeSearchBackend(StaticSearchBackend):
+    """Canned web search with injected latency"""
+
+    def __init__(self, results=None, latency=None):
+        super().__init__(results or [
+            {"title": f"Result {i}", "href": f"https://example.com/{i}", "body": f"Canned result {i}"}
+            for i in range(1, 6)
+        ])
+        self.latency = latency or Latency()
+
+    def search(self, query, max_results=3):
+        self.latency.wait()
+        return super().search(query, max_results)
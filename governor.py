@@ -0,0 +1,254 @@
+import random
+import threading
+import time
+
+
+# Requests and tokens per minute allowed per model, below the account limits
+MODEL_LIMITS = {
+    "gpt-4": {"rpm": 500, "tpm": 30000},
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-3.5-turbo": {"rpm": 3500, "tpm": 200000},
+    "gpt-3.5-turbo-16k": {"rpm": 3500, "tpm": 180000},
+}
+DEFAULT_LIMITS = {"rpm": 500, "tpm": 60000}
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+# Consecutive failures that open a model's circuit, and how long it stays open
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+
+# Errors worth retrying, matched by class name so no SDK has to be imported
+RETRYABLE_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ServiceUnavailableError", "Timeout", "TimeoutError", "ConnectionError",
+}
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit is open"""
+
+
+def is_retryable(error):
+    """Tells whether an error is transient, e.g. a rate limit or a server error"""
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def _retry_after(error):
+    """Returns the server's Retry-After in seconds, if the error carries one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Defining token bucket
+class TokenBucket:
+    """Allows capacity units per minute, refilled continuously"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount):
+        """Takes amount if it is available, otherwise returns the seconds to wait"""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return 0.0
+            return (amount - self.available) / self.rate
+
+    def give_back(self, amount):
+        with self.lock:
+            self.available = min(self.capacity, self.available + amount)
+
+
+# Defining circuit breaker
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds, then lets one trial call through.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class _ModelState:
+    def __init__(self, limits):
+        self.requests = TokenBucket(limits["rpm"])
+        self.tokens = TokenBucket(limits["tpm"])
+        self.breaker = CircuitBreaker()
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+
+
+# Defining request governor
+class RequestGovernor:
+    """
+    Gatekeeper for every LLM request. Requests and tokens per model are
+    limited by token buckets, transient errors are retried with jittered
+    exponential backoff, and a circuit breaker stops calling a model that keeps
+    failing so callers fail fast instead of piling up.
+    """
+
+    def __init__(self, limits=None, max_attempts=MAX_ATTEMPTS):
+        self.limits = dict(MODEL_LIMITS, **(limits or {}))
+        self.max_attempts = max_attempts
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model):
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = _ModelState(self.limits.get(model, DEFAULT_LIMITS))
+            return self._models[model]
+
+    def configure(self, model, rpm, tpm):
+        """Sets the request and token limits of a model"""
+        with self._lock:
+            self.limits[model] = {"rpm": rpm, "tpm": tpm}
+            self._models.pop(model, None)
+
+    def _acquire(self, state, estimated_tokens):
+        """Blocks until both buckets allow the request"""
+        with self._lock:
+            state.waiting += 1
+        try:
+            while True:
+                wait = state.requests.take(1)
+                if not wait:
+                    wait = state.tokens.take(estimated_tokens)
+                    if not wait:
+                        return
+                    state.requests.give_back(1)
+                with self._lock:
+                    state.throttled_seconds += wait
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                state.waiting -= 1
+
+    def call(self, model, request, estimated_tokens=0, span=None, max_attempts=None):
+        """
+        Runs request() for a model within its limits and returns its result,
+        trying at most max_attempts times (the governor's default if None).
+        The number of retries is recorded on span when one is given.
+        """
+        state = self._state(model)
+        max_attempts = max_attempts or self.max_attempts
+        for attempt in range(max_attempts):
+            if not state.breaker.allow():
+                with self._lock:
+                    state.rejected += 1
+                raise CircuitOpenError(f"Circuit for {model} is open after repeated failures")
+
+            self._acquire(state, estimated_tokens)
+            with self._lock:
+                state.in_flight += 1
+                state.calls += 1
+            try:
+                result = request()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    state.breaker.record_failure()
+                else:
+                    # The model answered, the request itself was bad
+                    state.breaker.record_success()
+                with self._lock:
+                    state.failures += 1
+                if not retryable or attempt == max_attempts - 1:
+                    raise
+                delay = _retry_after(e) or random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+                print(f"{model} request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                with self._lock:
+                    state.retries += 1
+                if span is not None:
+                    span.retries = attempt + 1
+                time.sleep(delay)
+            else:
+                state.breaker.record_success()
+                return result
+            finally:
+                with self._lock:
+                    state.in_flight -= 1
+
+    def metrics(self):
+        """Returns queue depth, throughput and circuit state per model"""
+        with self._lock:
+            return [
+                {
+                    "model": model,
+                    "waiting": state.waiting,
+                    "in_flight": state.in_flight,
+                    "calls": state.calls,
+                    "retries": state.retries,
+                    "failures": state.failures,
+                    "rejected": state.rejected,
+                    "throttled_s": round(state.throttled_seconds, 2),
+                    "circuit": state.breaker.state,
+                }
+                for model, state in sorted(self._models.items())
+            ]
+
+
+governor = RequestGovernor()
@@ -1,35 +1,39 @@
 import json
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, AIMessage
-import streamlit as st
-
-# Fetching api key
-api_key = st.secrets["api"]["key"]
+from concurrent.futures import ThreadPoolExecutor
+from answer_gate import MIN_WORDS, assess_answer
+from journal import InterviewJournal
+from resources import get_chat_llm, get_openai_key
+from routing import router
+from tokens import count_tokens
+from tracing import trace
 
 # Defining llm
 def llm_bot(api_key):
-    llm = ChatOpenAI(
-            openai_api_key=api_key,
+    llm = get_chat_llm(
             model="gpt-4",
             temperature=0.3,
-            max_tokens=200)
+            max_tokens=200,
+            api_key=api_key)
     return llm
 
 
 # Defining main interview agent logic
 class InterviewAgent:
-    def __init__(self, api_key):
-        self.llm = ChatOpenAI(
-            openai_api_key=api_key,
-            model="gpt-4",
-            temperature=0.3,
-            max_tokens=200
-        )
+    def __init__(self, api_key, follow_up_mode="combined", journal_path="interview_progress.jsonl"):
+        self.api_key = api_key
         self.phases = self._load_question_structure()
         self.conversation = []
         self.current_phase = 0
         self.current_question = 0
         self.follow_up_depth = 0
+        self.question_answered = False
+        # "combined" asks one structured question, "concurrent" runs both calls at once
+        self.follow_up_mode = follow_up_mode
+        # Long answers the local gate decided on, and the ones it escalated to the LLM
+        self.llm_calls_avoided = 0
+        self.llm_assessments = 0
+        # Append-only log the interview can be resumed from
+        self.journal = InterviewJournal(journal_path)
 
     def _load_question_structure(self):
         """Load the complete interview structure"""
@@ -111,17 +115,53 @@ class InterviewAgent:
      # Defining logic for followup questions
     def _needs_elaboration(self, response):
         """Check if response needs follow-up using multiple criteria"""
-        if len(response.split()) < 30:
-            return True
+        verdict = self._local_assessment(response)
+        if verdict is not None:
+            return verdict
         return self._llm_assessment(response)
 
+    # Deciding clear cases locally
+    def _local_assessment(self, response):
+        """Use the local answer gate, returning None when the LLM has to decide"""
+        verdict = assess_answer(response)
+        if verdict is not None and len(response.split()) >= MIN_WORDS:
+            self.llm_calls_avoided += 1
+        return verdict
+
+    def _chat_llm(self, model, route):
+        """Returns the shared chat model for a routed model"""
+        return get_chat_llm(
+            model=model,
+            temperature=0.3,
+            max_tokens=route.get("max_tokens") or 200,
+            api_key=self.api_key
+        )
+
+    # Sending a single prompt to the LLM
+    def _ask(self, prompt, call_site="interview.follow_up"):
+        """Send one human message and return the reply text"""
+        from langchain.schema import HumanMessage
+
+        # Each call site is routed to its own, usually cheaper, model
+        with trace("llm", call_site) as span:
+            reply = router.call(
+                call_site,
+                lambda model, route: self._chat_llm(model, route)([HumanMessage(content=prompt)]),
+                estimated_tokens=count_tokens(prompt) + 200,
+                span=span
+            )
+            span.set_usage(reply)
+        return reply.content
+
     # Assessing response quality
     def _llm_assessment(self, response):
         """Use LLM to assess response quality"""
         prompt = f"""Assess if this response needs follow-up (Answer only YES/NO):
         Response: {response[:500]}  # Truncate to save tokens
         Consider: Specific examples? Emotional depth? Concrete details?"""
-        return self.llm([HumanMessage(content=prompt)]).content == "YES"
+        self.llm_assessments += 1
+        verdict = self._ask(prompt, "interview.assessment")
+        return verdict.strip().upper().startswith("YES")
 
     # Generating followup question
     def _generate_follow_up(self, question, response):
@@ -130,19 +170,79 @@ class InterviewAgent:
         Original Q: {question}
         Response: {response[:300]}
         Keep it relevant and probing. Format: 'Follow-up: ...'"""
-        result = self.llm([HumanMessage(content=prompt)]).content
+        result = self._ask(prompt, "interview.follow_up")
         return result.replace("Follow-up: ", "").strip()
 
+    # Assessing response and generating follow-up in a single call
+    def _assess_and_follow_up(self, question, response):
+        """Use one LLM call to decide on and write a follow-up question"""
+        prompt = f"""Assess if this interview response needs follow-up.
+        Consider: Specific examples? Emotional depth? Concrete details?
+        Original Q: {question}
+        Response: {response[:500]}
+        If it does, write ONE relevant and probing follow-up question.
+        Answer only with JSON: {{"needs_follow_up": true or false, "follow_up": "question or empty"}}"""
+        self.llm_assessments += 1
+        result = self._ask(prompt, "interview.assess_and_follow_up")
+
+        try:
+            verdict = json.loads(result[result.find('{'):result.rfind('}') + 1])
+        except json.JSONDecodeError:
+            # Falling back to the two-call path when the reply is not JSON
+            if self._llm_assessment(response):
+                return self._generate_follow_up(question, response)
+            return None
+
+        follow_up = str(verdict.get("follow_up") or "").replace("Follow-up: ", "").strip()
+        if verdict.get("needs_follow_up") and follow_up:
+            return follow_up
+        return None
+
+    # Deciding on the next follow-up question
+    def next_follow_up(self, question, response):
+        """Return a follow-up question for the response, or None if it is detailed enough"""
+        # Clear cases are decided locally, so at most the question is generated
+        verdict = self._local_assessment(response)
+        if verdict is False:
+            return None
+        if verdict is True:
+            return self._generate_follow_up(question, response)
+
+        if self.follow_up_mode == "concurrent":
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                needed = executor.submit(self._llm_assessment, response)
+                follow_up = executor.submit(self._generate_follow_up, question, response)
+                return follow_up.result() if needed.result() else None
+
+        return self._assess_and_follow_up(question, response)
+
+    # Recording an answer
+    def record_answer(self, question, answer, phase):
+        """Add an answer to the conversation and journal it"""
+        entry = {
+            "question": question,
+            "answer": answer,
+            "phase": phase
+        }
+        self.conversation.append(entry)
+        self.journal.record_answer(entry)
+        return entry
+
     # Saving progress
     def _save_progress(self):
-        """Save conversation with token awareness"""
-        truncated_convo = [{
-            "q": msg["question"][:150],
-            "a": msg["answer"][:500]
-        } for msg in self.conversation]
-        
-        with open("interview_progress.json", "w") as f:
-            json.dump(truncated_convo, f)
+        """Journal the current interview position"""
+        self.journal.record_cursor(self.current_phase, self.current_question, self.follow_up_depth)
+
+    # Resuming progress
+    def resume(self):
+        """Rebuild conversation and position from the journal, returning True if there was any"""
+        state = self.journal.replay()
+        self.conversation = list(state["conversation"])
+        self.current_phase = state["current_phase"]
+        self.current_question = state["current_question"]
+        self.follow_up_depth = state["follow_up_depth"]
+        self.question_answered = state["question_answered"]
+        return bool(self.conversation)
 
     # Defining logic for conducting interview
     def conduct_interview(self):
@@ -155,41 +255,48 @@ class InterviewAgent:
                     question = phase['questions'][self.current_question]
                     print(f"[Question {self.current_question+1}] {question}")
                     
-                    # Getting initial response
-                    response = input("\nYour answer: ").strip()
-                    self.conversation.append({
-                        "question": question,
-                        "answer": response,
-                        "phase": phase['name']
-                    })
+                    if self.question_answered:
+                        # Picking up the follow-ups of a question answered before an interruption
+                        answers = self.conversation[-(self.follow_up_depth + 1):]
+                        response = " ".join(entry["answer"] for entry in answers)
+                        self.question_answered = False
+                    else:
+                        # Getting initial response
+                        response = input("\nYour answer: ").strip()
+                        self.record_answer(question, response, phase['name'])
+                        self.follow_up_depth = 0
 
                     # Follow-up logic
-                    self.follow_up_depth = 0
-                    while self._needs_elaboration(response) and self.follow_up_depth < 2:
-                        follow_up = self._generate_follow_up(question, response)
+                    while self.follow_up_depth < 2:
+                        follow_up = self.next_follow_up(question, response)
+                        if follow_up is None:
+                            break
                         print(f"\n[Follow-up] {follow_up}")
                         follow_resp = input("Your answer: ").strip()
                         
-                        self.conversation.append({
-                            "question": follow_up,
-                            "answer": follow_resp,
-                            "phase": phase['name']
-                        })
+                        self.record_answer(follow_up, follow_resp, phase['name'])
                         response += " " + follow_resp
                         self.follow_up_depth += 1
+                        self._save_progress()
 
                     self.current_question += 1
+                    self.follow_up_depth = 0
                     self._save_progress()
 
                 self.current_phase += 1
                 self.current_question = 0
+                self._save_progress()
 
             print("\nInterview complete! Final report saved.")
+            print(f"Answer gate avoided {self.llm_calls_avoided} LLM assessments "
+                  f"({self.llm_assessments} escalated)")
 
         except KeyboardInterrupt:
-            self._save_progress()
+            self.journal.close()
             print("\nProgress saved. You can resume later.")
 
 if __name__ == "__main__":
-    agent = InterviewAgent(api_key=api_key)
+    agent = InterviewAgent(api_key=get_openai_key())
+    if agent.resume():
+        print(f"Resuming interview with {len(agent.conversation)} answers already saved.")
     agent.conduct_interview()
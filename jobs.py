@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from journal import InterviewJournal, journal_path
+from u_profile import ProfileBuilder, save_profile
+
+
+# Builders kept for users without a running job; the least recently used is closed past this
+MAX_BUILDERS = 200
+
+
+# Defining a background profile job
+class ProfileJob:
+    """Builds and saves one user's profile on a background thread"""
+
+    def __init__(self, user_id, builder, interview_data, collection="profiles", on_finish=None):
+        self.user_id = user_id
+        self.status = "running"
+        self.done = 0
+        self.total = 0
+        self.phase = None
+        self.error = None
+        # Set when the user's interview is retaken while the job runs
+        self.cancelled = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self._builder = builder
+        self._interview_data = list(interview_data)
+        self._collection = collection
+        self._on_finish = on_finish
+        self._thread = threading.Thread(target=self._run, name=f"profile-job-{user_id}", daemon=True)
+
+    def _progress(self, done, total, phase):
+        self.done, self.total, self.phase = done, total, phase
+
+    def _run(self):
+        try:
+            profile_json = self._builder.build(self._interview_data, progress=self._progress)
+            # Saving a cancelled job would bring back the profile the retake deleted
+            if self.cancelled:
+                self.status = "cancelled"
+                return
+            if not save_profile(profile_json, collection=self._collection, doc_id=self.user_id):
+                raise RuntimeError("The profile could not be saved")
+            self.status = "done"
+        except Exception as e:
+            if self.cancelled:
+                # Closing the builder cancels its pending chunks, which fails the build
+                self.status = "cancelled"
+                return
+            self.error = str(e)
+            self.status = "failed"
+            print(f"Profile job for {self.user_id} failed: {e}")
+        finally:
+            self.finished_at = time.time()
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+    @property
+    def fraction(self):
+        """Share of chunks summarized so far, between 0 and 1"""
+        return self.done / self.total if self.total else 0.0
+
+
+# Defining job registry
+class ProfileJobRegistry:
+    """
+    Keeps one profile builder and at most one running profile job per user.
+    Both live in the process, so they survive Streamlit reruns and page
+    reloads, and a reloaded page picks up the job that is already running.
+
+    All builders summarize on one bounded thread pool, and builders of
+    abandoned interviews are closed least recently used first once more than
+    max_builders are kept. Finished chunks are checkpointed, so a user whose
+    builder was closed only loses the in-memory bookkeeping.
+    """
+
+    def __init__(self, max_workers=16, max_builders=MAX_BUILDERS):
+        self.max_workers = max_workers
+        self.max_builders = max_builders
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile-chunk")
+        self._builders = OrderedDict()
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def builder(self, user_id):
+        """Returns the user's incremental profile builder, creating it on first use"""
+        with self._lock:
+            if user_id in self._builders:
+                self._builders.move_to_end(user_id)
+                return self._builders[user_id]
+            builder = ProfileBuilder(max_workers=self.max_workers, executor=self._executor)
+            self._builders[user_id] = builder
+            evicted = self._evict_idle()
+        for old in evicted:
+            old.close()
+        return builder
+
+    def _evict_idle(self):
+        """Drops least recently used builders without a running job until max_builders are left"""
+        evicted = []
+        for user_id in list(self._builders):
+            if len(self._builders) <= self.max_builders:
+                break
+            job = self._jobs.get(user_id)
+            if job is not None and job.status == "running":
+                continue
+            evicted.append(self._builders.pop(user_id))
+            # A failed job without its builder is started again from the checkpoints
+            self._jobs.pop(user_id, None)
+        return evicted
+
+    def get(self, user_id):
+        """Returns the user's latest job, or None if there is none"""
+        with self._lock:
+            return self._jobs.get(user_id)
+
+    def start(self, user_id, interview_data, collection="profiles"):
+        """Starts building the user's profile, or returns the job already running"""
+        builder = self.builder(user_id)
+        with self._lock:
+            job = self._jobs.get(user_id)
+            if job is not None and job.status == "running":
+                return job
+            job = ProfileJob(user_id, builder, interview_data, collection, on_finish=self._finished)
+            self._jobs[user_id] = job
+            job._thread.start()
+            return job
+
+    def discard(self, user_id):
+        """
+        Forgets the user's builder and job, e.g. when the interview is retaken.
+        A running job is cancelled so it does not save the old profile, and the
+        next start() begins a fresh one.
+        """
+        with self._lock:
+            builder = self._builders.pop(user_id, None)
+            job = self._jobs.pop(user_id, None)
+            if job is not None:
+                job.cancelled = True
+        if builder is not None:
+            builder.close()
+
+    def _finished(self, job):
+        """
+        Cleans up after a job. Once the profile is saved the user's builder, job
+        and interview journal are no longer needed; a failed job keeps them so a
+        retry reuses the finished chunks. A builder discarded while the job ran
+        is closed either way.
+        """
+        with self._lock:
+            discarded = job.cancelled or self._builders.get(job.user_id) is not job._builder
+            saved = job.status == "done" and not discarded
+            if saved:
+                self._builders.pop(job.user_id)
+            if (saved or discarded) and self._jobs.get(job.user_id) is job:
+                self._jobs.pop(job.user_id)
+        if saved:
+            # A retake while the job ran has its own journal, so only a kept job resets it
+            InterviewJournal(journal_path(job.user_id)).reset()
+        if saved or discarded:
+            job._builder.close()
+
+
+profile_jobs = ProfileJobRegistry()
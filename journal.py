@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import threading
+
+
+# User IDs end up in file names, so only these characters are accepted
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def journal_path(user_id, directory="."):
+    """Returns the journal file of one user's interview"""
+    if not USER_ID_PATTERN.match(user_id):
+        raise ValueError(f"Invalid user id: {user_id!r}")
+    return os.path.join(directory, f"interview_progress_{user_id}.jsonl")
+
+
+def _empty_state():
+    return {
+        "conversation": [],
+        "current_phase": 0,
+        "current_question": 0,
+        "follow_up_depth": 0,
+        # Whether the current question's answer was recorded before the cursor moved on
+        "question_answered": False,
+    }
+
+
+# Defining append-only interview journal
+class InterviewJournal:
+    """
+    Append-only JSONL log of an interview. Every answer and cursor move is one
+    line, so saving is O(1); replaying the file rebuilds the interview state.
+
+    fsync is "always" (after every record), "batch" (every fsync_every records)
+    or "never". Once compact_every records have been appended since the last
+    compaction, the file is rewritten as a single snapshot line.
+    """
+
+    def __init__(self, path="interview_progress.jsonl", fsync="always", fsync_every=8,
+                 compact_every=256):
+        if fsync not in ("always", "batch", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+        self.state = _empty_state()
+        self._records_since_compaction = 0
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _apply(self, record):
+        """Applies one record to the in-memory state"""
+        kind = record.get("type")
+        if kind == "snapshot":
+            self.state = dict(_empty_state(), **record["state"])
+        elif kind == "answer":
+            self.state["conversation"].append(record["entry"])
+            self.state["question_answered"] = True
+        elif kind == "cursor":
+            position = (record["current_phase"], record["current_question"])
+            if position != (self.state["current_phase"], self.state["current_question"]):
+                self.state["question_answered"] = False
+            for key in ("current_phase", "current_question", "follow_up_depth"):
+                self.state[key] = record[key]
+
+    def replay(self):
+        """Rebuilds the interview state from the journal in one pass over its records"""
+        with self._lock:
+            self.state = _empty_state()
+            self._records_since_compaction = 0
+            if not os.path.exists(self.path):
+                return self.state
+            # Records are written whole with their newline, so a line without one is torn
+            complete = 0
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    complete += len(line)
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        continue
+                    self._apply(record)
+                    self._records_since_compaction += 1
+            if complete < os.path.getsize(self.path):
+                # Cutting off a torn last line from a crash mid-write, so the next
+                # record does not get appended to it and lost on the next replay
+                with open(self.path, "r+b") as f:
+                    f.truncate(complete)
+            return self.state
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _sync(self):
+        self._file.flush()
+        self._unsynced += 1
+        if self.fsync == "always" or (
+            self.fsync == "batch" and self._unsynced >= self.fsync_every
+        ):
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def append(self, record):
+        """Appends one record and compacts the journal when it has grown enough"""
+        with self._lock:
+            self._apply(record)
+            self._open().write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._sync()
+            self._records_since_compaction += 1
+            if self._records_since_compaction >= self.compact_every:
+                self._compact()
+
+    def record_answer(self, entry):
+        """Journals one question/answer entry"""
+        self.append({"type": "answer", "entry": entry})
+
+    def record_cursor(self, current_phase, current_question, follow_up_depth):
+        """Journals the interview position"""
+        self.append({
+            "type": "cursor",
+            "current_phase": current_phase,
+            "current_question": current_question,
+            "follow_up_depth": follow_up_depth,
+        })
+
+    def _compact(self):
+        """Atomically replaces the journal with a single snapshot of the state"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "snapshot", "state": self.state}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self._records_since_compaction = 1
+        self._unsynced = 0
+
+    def compact(self):
+        """Compacts the journal now"""
+        with self._lock:
+            self._compact()
+
+    def reset(self):
+        """Deletes the journal, e.g. once the interview has been turned into a profile"""
+        with self._lock:
+            self._close_file()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.state = _empty_state()
+            self._records_since_compaction = 0
+
+    def _close_file(self):
+        if self._file is not None:
+            if self._unsynced:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._unsynced = 0
+
+    def close(self):
+        """Flushes pending records to disk and closes the journal file"""
+        with self._lock:
+            self._close_file()
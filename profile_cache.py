@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from cache import TTLCache
+from tracing import trace
+
+
+# How long a profile read from Firestore is trusted without a listener
+PROFILE_TTL = 300
+# Snapshots pushed by a listener still expire eventually in case it dies silently
+WATCHED_PROFILE_TTL = 3600
+# Open snapshot listeners, one per user; the least recently watched is closed past this
+MAX_WATCHES = 200
+
+_profiles = TTLCache(ttl=PROFILE_TTL, max_entries=256)
+_watches = OrderedDict()
+_watch_lock = threading.Lock()
+
+
+def _fetch_profile(db, collection, doc_id):
+    """Reads the profile document from Firestore"""
+    doc = db.collection(collection).document(doc_id).get()
+
+    if doc.exists:
+        print("Profile loaded from Firebase")
+        return doc.to_dict()
+    else:
+        print("No profile found in Firebase")
+        return {}
+
+
+# Defining cached profile access
+def get_profile(db, collection="profiles", doc_id="current_user"):
+    """Returns the cached profile, reading Firestore only on a miss or expiry"""
+    with trace("firestore", "profile.get") as span:
+        # Only a miss reaches the loader
+        span.cache_hit = True
+
+        def load():
+            span.cache_hit = False
+            return _fetch_profile(db, collection, doc_id)
+
+        return _profiles.get_or_load((collection, doc_id), load)
+
+
+def invalidate_profile(collection="profiles", doc_id="current_user"):
+    """Forgets the cached profile so the next read goes to Firestore"""
+    _profiles.invalidate((collection, doc_id))
+
+
+def watch_profile(db, collection="profiles", doc_id="current_user"):
+    """
+    Keeps the cached profile current through a Firestore snapshot listener.
+    While the listener is alive its snapshots replace the cached entry, so reads
+    only hit the network when the document actually changes. Safe to call
+    repeatedly; every call marks the listener as recently used, and the least
+    recently used one is closed once MAX_WATCHES are open.
+    """
+    key = (collection, doc_id)
+
+    def on_snapshot(doc_snapshots, changes, read_time):
+        for doc in doc_snapshots:
+            _profiles.set(key, doc.to_dict() if doc.exists else {}, ttl=WATCHED_PROFILE_TTL)
+
+    with _watch_lock:
+        if key in _watches:
+            _watches.move_to_end(key)
+            return
+        while len(_watches) >= MAX_WATCHES:
+            _close_watch(*_watches.popitem(last=False))
+        try:
+            _watches[key] = db.collection(collection).document(doc_id).on_snapshot(on_snapshot)
+        except Exception as e:
+            # Falling back to TTL expiry only
+            print(f"Failed to watch profile: {e}")
+
+
+def _close_watch(key, watch):
+    """Stops a snapshot listener and drops the entry it was keeping fresh"""
+    try:
+        watch.unsubscribe()
+    except Exception as e:
+        print(f"Failed to stop watching profile: {e}")
+    # Without the listener the entry would be trusted for WATCHED_PROFILE_TTL
+    _profiles.invalidate(key)
+
+
+def profile_cache_stats():
+    """Returns hit/miss counters of the profile cache"""
+    return _profiles.stats()
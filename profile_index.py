@@ -0,0 +1,135 @@
+import json
+import math
+import re
+from collections import Counter
+from cache import TTLCache, content_hash
+from tokens import count_tokens
+
+
+# Facets whose key matches this are always sent, whatever the query
+CORE_FACET_PATTERN = re.compile(r"value|personality|trait", re.IGNORECASE)
+PART_KEY_PATTERN = re.compile(r"^part_\d+$")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "some", "that", "the", "to",
+    "what", "with", "good", "best", "recommend", "recommendation", "recommendations",
+}
+
+_indexes = TTLCache(ttl=0, max_entries=32)
+
+
+def tokenize(text):
+    """Splits text into lowercase terms without stopwords, folding simple plurals"""
+    terms = []
+    for term in re.findall(r"[a-z0-9]+", text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def iter_facets(profile):
+    """
+    Yields (path, value) for every facet of a profile. A facet is a top-level
+    key of a phase summary; part_N wrappers are kept in the path.
+    """
+    for phase, summary in profile.items():
+        if not isinstance(summary, dict):
+            yield (phase,), summary
+            continue
+
+        if summary and all(PART_KEY_PATTERN.match(key) for key in summary):
+            parts = summary.items()
+        else:
+            parts = [(None, summary)]
+
+        for part, body in parts:
+            prefix = (phase,) if part is None else (phase, part)
+            if not isinstance(body, dict):
+                yield prefix, body
+                continue
+            for key, value in body.items():
+                yield prefix + (key,), value
+
+
+# Defining retrieval index over profile facets
+class ProfileIndex:
+    """
+    BM25 index over the facets of one profile version, used to send only the
+    parts of a profile that are relevant to a query.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, profile):
+        # Facets are budgeted by their compact rendering, which is what the prompt gets
+        from profile_render import get_rendering
+
+        rendered = {tuple(facet["path"]): facet["text"] for facet in get_rendering(profile)["facets"]}
+        self.facets = []
+        for path, value in iter_facets(profile):
+            text = " ".join(str(key) for key in path) + " " + json.dumps(value, ensure_ascii=False)
+            self.facets.append({
+                "path": path,
+                "terms": Counter(tokenize(text.replace("_", " "))),
+                "tokens": count_tokens(rendered.get(tuple(path), "")),
+                "core": bool(CORE_FACET_PATTERN.search(str(path[-1]))),
+            })
+
+        self.doc_freq = Counter()
+        for facet in self.facets:
+            self.doc_freq.update(facet["terms"].keys())
+        lengths = [sum(facet["terms"].values()) for facet in self.facets]
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    def score(self, query):
+        """Returns the BM25 score of every facet for the query"""
+        n = len(self.facets)
+        scores = []
+        for facet in self.facets:
+            terms = facet["terms"]
+            length = sum(terms.values())
+            score = 0.0
+            for term in set(tokenize(query)):
+                tf = terms.get(term, 0)
+                if not tf:
+                    continue
+                df = self.doc_freq[term]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+                score += idf * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def _select_facets(self, query, top_k, token_budget):
+        """
+        Picks the core facets plus up to top_k facets that match the query,
+        stopping once token_budget would be exceeded.
+        """
+        selected = [facet for facet in self.facets if facet["core"]]
+        used = sum(facet["tokens"] for facet in selected)
+
+        ranked = sorted(
+            (pair for pair in zip(self.score(query), self.facets) if pair[0] > 0 and not pair[1]["core"]),
+            key=lambda pair: pair[0], reverse=True
+        )
+        for _, facet in ranked[:top_k]:
+            if used + facet["tokens"] > token_budget:
+                continue
+            selected.append(facet)
+            used += facet["tokens"]
+        return {id(facet) for facet in selected}
+
+    def select_paths(self, query, top_k=6, token_budget=1500):
+        """Returns the paths of the selected facets in their original order"""
+        chosen = self._select_facets(query, top_k, token_budget)
+        return [facet["path"] for facet in self.facets if id(facet) in chosen]
+
+
+def get_profile_index(profile):
+    """Returns the index for a profile, built once per profile version"""
+    return _indexes.get_or_load(content_hash(profile), lambda: ProfileIndex(profile))
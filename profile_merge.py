@@ -0,0 +1,88 @@
+import json
+import re
+
+
+# Defining local structural merge of chunk summaries
+def normalize_key(key):
+    """Turns 'Personality Traits' or 'personality-traits' into 'personality_traits'"""
+    return re.sub(r"[^a-z0-9]+", "_", str(key).strip().lower()).strip("_") or str(key)
+
+
+def _fingerprint(value):
+    """Returns a comparison key that ignores case, spacing and trailing punctuation"""
+    if isinstance(value, str):
+        return " ".join(value.lower().split()).rstrip(".!;,")
+    return json.dumps(normalize_value(value), sort_keys=True)
+
+
+def _append_unique(items, value, seen):
+    values = value if isinstance(value, list) else [value]
+    for item in values:
+        fingerprint = _fingerprint(item)
+        if fingerprint not in seen and item not in ("", None, [], {}):
+            seen.add(fingerprint)
+            items.append(item)
+
+
+def normalize_value(value):
+    """Normalizes keys and removes duplicate list items throughout a summary"""
+    if isinstance(value, dict):
+        merged = {}
+        for key, item in value.items():
+            key = normalize_key(key)
+            merged[key] = merge_values(merged[key], item) if key in merged else normalize_value(item)
+        return merged
+    if isinstance(value, list):
+        items, seen = [], set()
+        _append_unique(items, [normalize_value(item) for item in value], seen)
+        return items
+    return value
+
+
+def merge_values(left, right):
+    """
+    Merges two summary values. Dicts are merged key by key, lists and differing
+    scalars become one deduplicated list, and equal scalars are kept once.
+    """
+    left, right = normalize_value(left), normalize_value(right)
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = merge_values(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(left, dict) or isinstance(right, dict):
+        # A dict next to a plain value: keep the plain value under details
+        mapping, other = (left, right) if isinstance(left, dict) else (right, left)
+        return merge_values(mapping, {"details": other})
+    if not isinstance(left, list) and not isinstance(right, list) and _fingerprint(left) == _fingerprint(right):
+        return left
+
+    items, seen = [], set()
+    _append_unique(items, left, seen)
+    _append_unique(items, right, seen)
+    return items[0] if len(items) == 1 else items
+
+
+def merge_summaries(summaries):
+    """Merges the chunk summaries of one phase into a single summary"""
+    merged = {}
+    for summary in summaries:
+        if not isinstance(summary, dict):
+            summary = {"details": summary}
+        merged = merge_values(merged, summary)
+    return merged
+
+
+def reduce_hierarchically(items, combine, fan_in=4):
+    """
+    Combines items in groups of fan_in, then combines the results the same way
+    until one is left, so no single combine call sees more than fan_in inputs.
+    A group left with a single item is passed on as it is.
+    """
+    if not items:
+        return {}
+    fan_in = max(2, fan_in)
+    while len(items) > 1:
+        groups = [items[i:i + fan_in] for i in range(0, len(items), fan_in)]
+        items = [group[0] if len(group) == 1 else combine(group) for group in groups]
+    return items[0]
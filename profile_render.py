@@ -0,0 +1,71 @@
+from cache import TTLCache, content_hash
+from profile_index import iter_facets
+
+
+# Field of the profile document holding its prompt rendering
+RENDERING_FIELD = "_prompt"
+# Bumped whenever the rendering format changes, older renderings are redone
+RENDER_VERSION = 1
+
+_renderings = TTLCache(ttl=0, max_entries=32)
+
+
+def _render_scalar(value):
+    if isinstance(value, list):
+        return "; ".join(_render_scalar(item) for item in value if item not in ("", None))
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_render_scalar(item)}" for key, item in value.items())
+    return " ".join(str(value).split())
+
+
+def _render_lines(key, value):
+    """Flattens nested dicts into 'key.sub: value' lines"""
+    if isinstance(value, dict) and value:
+        for sub_key, item in value.items():
+            yield from _render_lines(f"{key}.{sub_key}", item)
+    else:
+        yield f"{key}: {_render_scalar(value)}"
+
+
+# Defining compact prompt rendering
+def render_profile(profile):
+    """
+    Renders every facet of a profile as terse key-path lines, which take far
+    fewer tokens in a prompt than indented JSON.
+    """
+    facets = []
+    for path, value in iter_facets(profile):
+        key = ".".join(str(part) for part in path[1:]) or str(path[0])
+        facets.append({"path": list(path), "text": "\n".join(_render_lines(key, value))})
+    return {"version": RENDER_VERSION, "profile_hash": content_hash(profile), "facets": facets}
+
+
+def split_rendering(document):
+    """Separates a stored profile document into the profile and its rendering"""
+    document = dict(document or {})
+    rendering = document.pop(RENDERING_FIELD, None)
+    return document, rendering
+
+
+def remember_rendering(profile, rendering):
+    """Keeps a stored rendering if it is current and belongs to this profile"""
+    if not rendering or rendering.get("version") != RENDER_VERSION:
+        return
+    profile_hash = content_hash(profile)
+    if rendering.get("profile_hash") == profile_hash:
+        _renderings.set(profile_hash, rendering)
+
+
+def get_rendering(profile):
+    """Returns the rendering of a profile, rendering it once per profile version"""
+    return _renderings.get_or_load(content_hash(profile), lambda: render_profile(profile))
+
+
+def render_selection(profile, paths):
+    """Returns the rendered text of the given facet paths, grouped under their phase"""
+    wanted = {tuple(path) for path in paths}
+    sections = {}
+    for facet in get_rendering(profile)["facets"]:
+        if tuple(facet["path"]) in wanted:
+            sections.setdefault(facet["path"][0], []).append(facet["text"])
+    return "\n".join(f"[{phase}]\n" + "\n".join(lines) for phase, lines in sections.items())
@@ -0,0 +1,75 @@
+import threading
+from cache import TTLCache, content_hash, normalize_query
+from profile_index import tokenize
+
+
+RECOMMENDATION_TTL = 60 * 60
+RECOMMENDATION_MAX_ENTRIES = 512
+# Minimum Jaccard overlap of query terms for a near-duplicate to count as a hit
+SIMILARITY_THRESHOLD = 0.8
+
+
+# Defining recommendation response cache
+class RecommendationCache:
+    """
+    Caches generated recommendations by profile version and normalized query,
+    optionally answering rephrased queries from a similar cached one.
+    """
+
+    def __init__(self, ttl=RECOMMENDATION_TTL, max_entries=RECOMMENDATION_MAX_ENTRIES,
+                 similarity_threshold=SIMILARITY_THRESHOLD):
+        self.similarity_threshold = similarity_threshold
+        self.similar_hits = 0
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries)
+        self._terms = {}
+        self._lock = threading.Lock()
+
+    def get(self, profile, query):
+        """Returns cached recommendations for the profile and query, or None"""
+        profile_version = content_hash(profile)
+        key = (profile_version, normalize_query(query))
+        text = self._cache.get(key)
+        if text is not None or not self.similarity_threshold:
+            return text
+
+        # Looking for a near-duplicate query against the same profile version
+        terms = set(tokenize(query))
+        best_key, best_score = None, 0.0
+        with self._lock:
+            candidates = [(k, self._terms.get(k)) for k in self._cache.keys() if k[0] == profile_version]
+        for candidate, candidate_terms in candidates:
+            if not terms or not candidate_terms:
+                continue
+            score = len(terms & candidate_terms) / len(terms | candidate_terms)
+            if score > best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.similarity_threshold:
+            text = self._cache.get(best_key)
+            if text is not None:
+                self.similar_hits += 1
+        return text
+
+    def set(self, profile, query, text):
+        """Stores recommendations for the profile and query"""
+        key = (content_hash(profile), normalize_query(query))
+        self._cache.set(key, text)
+        with self._lock:
+            self._terms[key] = set(tokenize(query))
+            # Forgetting terms of entries the cache has since evicted
+            if len(self._terms) > 2 * self._cache.max_entries:
+                live = set(self._cache.keys())
+                self._terms = {k: v for k, v in self._terms.items() if k in live}
+
+    def clear(self):
+        """Drops every cached response, e.g. after a new profile is saved"""
+        self._cache.clear()
+        with self._lock:
+            self._terms.clear()
+
+    def stats(self):
+        """Returns hit/miss counters, including near-duplicate hits"""
+        return dict(self._cache.stats(), similar_hits=self.similar_hits)
+
+
+recommendation_cache = RecommendationCache()
@@ -0,0 +1,118 @@
+import threading
+
+
+# Connection pool shared by every OpenAI call in the process
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY = 60
+REQUEST_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 5.0
+
+_lock = threading.RLock()
+_http_client = None
+_openai_clients = {}
+_chat_llms = {}
+_firestore_client = None
+_openai_override = None
+_chat_llm_factory = None
+
+
+def use_clients(openai_client=None, chat_llm_factory=None, firestore_client=None):
+    """
+    Replaces the shared clients, e.g. with local stand-ins for benchmarks.
+    chat_llm_factory(model, temperature, max_tokens) builds chat models.
+    """
+    global _openai_override, _chat_llm_factory, _firestore_client
+    with _lock:
+        _openai_override = openai_client
+        _chat_llm_factory = chat_llm_factory
+        _chat_llms.clear()
+        if firestore_client is not None:
+            _firestore_client = firestore_client
+
+
+def get_secrets():
+    """Returns the Streamlit secrets, importing Streamlit only when needed"""
+    import streamlit as st
+
+    return st.secrets
+
+
+def get_openai_key():
+    """Returns the OpenAI API key from Streamlit secrets"""
+    return get_secrets()["api"]["key"]
+
+
+def get_http_client():
+    """Returns the pooled HTTP client used by all OpenAI clients"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            import httpx
+            import openai
+
+            _http_client = openai.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+        return _http_client
+
+
+def get_openai_client(api_key=None):
+    """Returns a shared OpenAI client, created on first use"""
+    if _openai_override is not None:
+        return _openai_override
+    api_key = api_key or get_openai_key()
+    with _lock:
+        if api_key not in _openai_clients:
+            from openai import OpenAI
+
+            # Retries are left to the request governor so they are not multiplied
+            _openai_clients[api_key] = OpenAI(
+                api_key=api_key, http_client=get_http_client(), max_retries=0
+            )
+        return _openai_clients[api_key]
+
+
+def get_chat_llm(model="gpt-4", temperature=0.3, max_tokens=200, api_key=None):
+    """Returns a shared LangChain chat model for the given settings"""
+    with _lock:
+        if _chat_llm_factory is not None:
+            return _chat_llm_factory(model, temperature, max_tokens)
+
+    api_key = api_key or get_openai_key()
+    key = (api_key, model, temperature, max_tokens)
+    with _lock:
+        if key not in _chat_llms:
+            from langchain.chat_models import ChatOpenAI
+
+            # Reusing the pooled OpenAI client instead of letting LangChain build its own
+            _chat_llms[key] = ChatOpenAI(
+                openai_api_key=api_key,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                max_retries=0,
+                client=get_openai_client(api_key).chat.completions,
+            )
+        return _chat_llms[key]
+
+
+def get_firestore():
+    """Initializes Firebase once and returns the shared Firestore client"""
+    global _firestore_client
+    with _lock:
+        if _firestore_client is None:
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+
+            # Load Firebase credentials from Streamlit secrets
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(dict(get_secrets()["firebase"]))
+                firebase_admin.initialize_app(cred)
+            _firestore_client = firestore.client()
+        return _firestore_client
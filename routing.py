@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from governor import CircuitOpenError, governor, is_retryable
+from tracing import percentile
+
+
+# Models tried per call site in order, with the completion limit the call needs.
+# A model whose recent p95 latency is over max_p95_ms is tried after the others.
+ROUTES = {
+    "interview.assessment": {
+        "models": ["gpt-4o-mini", "gpt-3.5-turbo", "gpt-4"], "max_tokens": 5, "max_p95_ms": 3000,
+    },
+    "interview.follow_up": {
+        "models": ["gpt-4o-mini", "gpt-3.5-turbo", "gpt-4"], "max_tokens": 100, "max_p95_ms": 4000,
+    },
+    "interview.assess_and_follow_up": {
+        "models": ["gpt-4o-mini", "gpt-3.5-turbo", "gpt-4"], "max_tokens": 150, "max_p95_ms": 4000,
+    },
+    "profile.phase_summary": {
+        "models": ["gpt-3.5-turbo-16k", "gpt-4o-mini"], "max_tokens": None, "max_p95_ms": 60000,
+    },
+    "profile.condense": {
+        "models": ["gpt-3.5-turbo-16k", "gpt-4o-mini"], "max_tokens": None, "max_p95_ms": 60000,
+    },
+    "recommendations": {
+        "models": ["gpt-4", "gpt-4o"], "max_tokens": None, "max_p95_ms": 30000,
+    },
+}
+
+# Latency samples older than this are dropped, so a slow model is tried again later
+LATENCY_WINDOW_SECONDS = 300
+LATENCY_WINDOW_SIZE = 50
+# Fewer samples than this are not enough to call a model slow
+MIN_SAMPLES = 5
+# Attempts on a model that still has a fallback; the last model gets the governor's full retries
+FALLBACK_MAX_ATTEMPTS = 2
+
+
+def completion_options(route):
+    """Returns the chat completion options a route adds to the request"""
+    return {"max_tokens": route["max_tokens"]} if route.get("max_tokens") else {}
+
+
+def _load_route_overrides():
+    """
+    Reads [routing] from Streamlit secrets, mapping a call site to a list of
+    models or to a table with models, max_tokens and max_p95_ms.
+    """
+    try:
+        from resources import get_secrets
+
+        overrides = dict(get_secrets().get("routing", {}))
+    except Exception:
+        # No secrets outside the app, e.g. in the CLI or benchmarks
+        return {}
+    return {
+        call_site: {"models": list(route)} if isinstance(route, (list, tuple)) else dict(route)
+        for call_site, route in overrides.items()
+    }
+
+
+# Defining latency-aware model router
+class ModelRouter:
+    """
+    Picks the model for each call site from its route and falls back to the
+    next model when one is slow, fails after the governor's retries, or has
+    its circuit open.
+    """
+
+    def __init__(self, routes=None, use_secrets=True):
+        self.routes = {call_site: dict(route) for call_site, route in (routes or ROUTES).items()}
+        self._use_secrets = use_secrets
+        self._overrides_loaded = False
+        self._samples = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def route(self, call_site):
+        """Returns the route of a call site, applying secrets overrides on first use"""
+        with self._lock:
+            if self._use_secrets and not self._overrides_loaded:
+                self._overrides_loaded = True
+                for site, override in _load_route_overrides().items():
+                    self.routes[site] = dict(self.routes.get(site, {}), **override)
+            return self.routes[call_site]
+
+    def record(self, call_site, model, latency_ms, ok=True):
+        """
+        Adds a latency sample for a model at a call site, counting failures
+        separately. Samples are kept per call site, since a model's latency on a
+        5-token assessment says nothing about a full phase summary.
+        """
+        key = (call_site, model)
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=LATENCY_WINDOW_SIZE))
+            samples.append((time.monotonic(), latency_ms))
+            if not ok:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def p95(self, call_site, model):
+        """Returns the p95 latency of a model at a call site over the recent window, or None"""
+        cutoff = time.monotonic() - LATENCY_WINDOW_SECONDS
+        with self._lock:
+            latencies = [latency for at, latency in self._samples.get((call_site, model), ()) if at >= cutoff]
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return percentile(latencies, 0.95)
+
+    def candidates(self, call_site):
+        """Returns the route's models, healthy ones first in their configured order"""
+        route = self.route(call_site)
+        circuits = {row["model"]: row["circuit"] for row in governor.metrics()}
+        max_p95 = route.get("max_p95_ms")
+
+        def healthy(model):
+            if circuits.get(model) == "open":
+                return False
+            p95 = self.p95(call_site, model)
+            return max_p95 is None or p95 is None or p95 <= max_p95
+
+        models = route["models"]
+        return [m for m in models if healthy(m)] + [m for m in models if not healthy(m)]
+
+    def call(self, call_site, request, estimated_tokens=0, span=None):
+        """
+        Calls request(model, route) through the governor with the first usable
+        model of the call site, moving on to the next one if it fails.
+        """
+        route = self.route(call_site)
+        models = self.candidates(call_site)
+        for position, model in enumerate(models):
+            # Moving on after a short retry is faster than backing off on a failing model
+            last = position == len(models) - 1
+            start = time.perf_counter()
+            try:
+                result = governor.call(
+                    model, lambda: request(model, route), estimated_tokens=estimated_tokens, span=span,
+                    max_attempts=None if last else FALLBACK_MAX_ATTEMPTS
+                )
+            except Exception as e:
+                # A rejected call says nothing about the model's latency
+                if not isinstance(e, CircuitOpenError):
+                    self.record(call_site, model, (time.perf_counter() - start) * 1000, ok=False)
+                fallback = isinstance(e, CircuitOpenError) or is_retryable(e)
+                if not fallback or last:
+                    raise
+                print(f"{call_site}: {model} failed ({type(e).__name__}), falling back to {models[position + 1]}")
+                continue
+
+            self.record(call_site, model, (time.perf_counter() - start) * 1000)
+            if span is not None:
+                span.model = model
+                if position:
+                    span.attributes["fallback_from"] = models[0]
+            return result
+
+    def stats(self):
+        """Returns sample count, p95 latency and failures per call site and model"""
+        with self._lock:
+            keys = sorted(set(self._samples) | set(self._errors))
+        return [
+            {"call_site": call_site, "model": model, "samples": len(self._samples.get((call_site, model), ())),
+             "p95_ms": self.p95(call_site, model), "errors": self._errors.get((call_site, model), 0)}
+            for call_site, model in keys
+        ]
+
+
+router = ModelRouter()
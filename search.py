@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import Future
+from itertools import islice
+from cache import SQLiteTTLCache, normalize_query
+from tracing import trace
+
+
+# Where cached search results are kept across restarts
+SEARCH_CACHE_PATH = "search_cache.sqlite3"
+SEARCH_CACHE_TTL = 6 * 60 * 60
+SEARCH_CACHE_MAX_ENTRIES = 1000
+
+
+# Defining search backends
+class DDGSBackend:
+    """Searches the web through DuckDuckGo"""
+
+    def search(self, query, max_results=3):
+        from duckduckgo_search import DDGS
+
+        with DDGS() as ddgs:
+            results = islice(ddgs.text(query), max_results)
+            return list(results)
+
+
+class StaticSearchBackend:
+    """Local stand-in that answers every query from canned results"""
+
+    def __init__(self, results=None):
+        self.results = results or []
+        self.calls = 0
+
+    def search(self, query, max_results=3):
+        self.calls += 1
+        return list(self.results[:max_results])
+
+
+_backend = DDGSBackend()
+_cache = None
+_cache_lock = threading.Lock()
+# Searches running right now, so identical concurrent queries share one request
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_joined = 0
+
+
+def set_search_backend(backend, cache=None):
+    """Replaces the search backend, and optionally the result cache, e.g. in tests"""
+    global _backend, _cache
+    _backend = backend
+    if cache is not None:
+        _cache = cache
+
+
+def _get_cache():
+    """Opens the on-disk result cache on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteTTLCache(
+                SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES
+            )
+        return _cache
+
+
+# Searching web for getting updated results
+def search_web(query, max_results=3):
+    """
+    Returns web results for a query, served from the cache when it was seen
+    recently. A query already being searched by another thread waits for
+    that search instead of sending its own.
+    """
+    global _joined
+    cache = _get_cache()
+    key = f"{max_results}:{normalize_query(query)}"
+
+    with trace("search", "search.web", results=max_results) as span:
+        results = cache.get(key)
+        span.cache_hit = results is not None
+        if results is not None:
+            return results
+
+        with _in_flight_lock:
+            flight = _in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _in_flight[key] = Future()
+            else:
+                _joined += 1
+        if not leader:
+            span.cache_hit = True
+            return flight.result()
+
+        try:
+            results = _backend.search(query, max_results)
+            # Empty results are usually transient, so they are not cached
+            if results:
+                cache.set(key, results)
+            flight.set_result(results)
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with _in_flight_lock:
+                _in_flight.pop(key, None)
+    return results
+
+
+def search_cache_stats():
+    """Returns hit/miss counters of the search cache and searches joined while in flight"""
+    return dict(_get_cache().stats(), joined=_joined)
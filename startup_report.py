@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# Modules imported on each feature path of app.py
+FEATURE_MODULES = {
+    "startup": ["twin", "profile_cache", "resources"],
+    "recommendations": ["twin"],
+    "interview": ["interview_agent", "u_profile", "conversation_store"],
+    "clients": ["openai", "firebase_admin", "langchain.schema", "duckduckgo_search"],
+}
+
+
+def measure_imports(modules):
+    """Imports modules in a fresh interpreter with -X importtime and parses its report"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return imports
+
+
+def feature_report(feature, modules, top=10):
+    """Returns the total import time of a feature path and its heaviest imports"""
+    imports = measure_imports(modules)
+    # Top-level entries already include everything they import
+    total = sum(entry["cumulative_ms"] for entry in imports if entry["depth"] == 0)
+    heaviest = sorted(imports, key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+    return {"feature": feature, "modules": modules, "total_ms": round(total, 1), "heaviest": heaviest}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time of app.py's feature paths")
+    parser.add_argument("features", nargs="*", default=list(FEATURE_MODULES),
+                        help="feature paths to measure (default: all)")
+    parser.add_argument("--top", type=int, default=10, help="number of heaviest imports to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    reports = []
+    for feature in args.features:
+        try:
+            reports.append(feature_report(feature, FEATURE_MODULES[feature], args.top))
+        except RuntimeError as e:
+            reports.append({"feature": feature, "modules": FEATURE_MODULES[feature], "error": str(e)})
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for report in reports:
+        print(f"\n=== {report['feature']} ({', '.join(report['modules'])}) ===")
+        if "error" in report:
+            print(f"  failed: {report['error']}")
+            continue
+        print(f"  total: {report['total_ms']:.1f} ms")
+        for entry in report["heaviest"]:
+            print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+_encodings = {}
+
+
+def _get_encoding(model):
+    """Returns the tiktoken encoding for a model, or None when it cannot be loaded"""
+    if model not in _encodings:
+        try:
+            import tiktoken
+        except ImportError:  # Falling back to a character-based estimate
+            _encodings[model] = None
+            return None
+
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken downloads its BPE files on first use
+            print(f"Failed to load tokenizer for {model}, estimating tokens: {e}")
+            _encodings[model] = None
+    return _encodings[model]
+
+
+# Counting tokens locally
+def count_tokens(text, model="gpt-4"):
+    """Counts the tokens of text for a model, or estimates them when tiktoken is unavailable"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,182 @@
+import json
+import math
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# How many finished spans are kept in memory for the sidebar and exports
+MAX_SPANS = 2000
+
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile of values, e.g. fraction=0.95 for p95, or None if empty"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# Defining a single traced call
+class Span:
+    """One LLM, search or Firestore call with its timing, token usage and outcome"""
+
+    def __init__(self, kind, call_site, model=None, **attributes):
+        self.kind = kind
+        self.call_site = call_site
+        self.model = model
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.latency_ms = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.retries = 0
+        self.cache_hit = False
+        self.error = None
+        self.attributes = attributes
+
+    def set_usage(self, usage):
+        """Copies token counts from an OpenAI usage object or a LangChain message"""
+        if usage is None:
+            return
+        # LangChain messages carry usage in usage_metadata or response_metadata
+        metadata = getattr(usage, "usage_metadata", None)
+        if metadata:
+            self.prompt_tokens = metadata.get("input_tokens")
+            self.completion_tokens = metadata.get("output_tokens")
+            return
+        token_usage = (getattr(usage, "response_metadata", None) or {}).get("token_usage")
+        if token_usage:
+            self.prompt_tokens = token_usage.get("prompt_tokens")
+            self.completion_tokens = token_usage.get("completion_tokens")
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+    def to_dict(self):
+        return dict({
+            "kind": self.kind,
+            "call_site": self.call_site,
+            "model": self.model,
+            "started_at": self.started_at,
+            "latency_ms": self.latency_ms,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+        }, **self.attributes)
+
+
+# Defining in-process tracer
+class Tracer:
+    """Collects finished spans in a bounded, thread-safe buffer"""
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.enabled = True
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, kind, call_site, model=None, **attributes):
+        """Times the enclosed call and records it, also when it raises"""
+        span = Span(kind, call_site, model, **attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.add(span)
+
+    def add(self, span):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self):
+        """Returns the recorded spans as dicts, oldest first"""
+        with self._lock:
+            return [span.to_dict() for span in self._spans]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self):
+        """Aggregates spans per kind, call site and model"""
+        groups = {}
+        for span in self.spans():
+            key = (span["kind"], span["call_site"], span["model"])
+            groups.setdefault(key, []).append(span)
+
+        rows = []
+        for (kind, call_site, model), spans in sorted(groups.items(), key=lambda item: str(item[0])):
+            latencies = [span["latency_ms"] for span in spans]
+            rows.append({
+                "kind": kind,
+                "call_site": call_site,
+                "model": model,
+                "calls": len(spans),
+                "cache_hits": sum(1 for span in spans if span["cache_hit"]),
+                "errors": sum(1 for span in spans if span["error"]),
+                "retries": sum(span["retries"] for span in spans),
+                "prompt_tokens": sum(span["prompt_tokens"] or 0 for span in spans),
+                "completion_tokens": sum(span["completion_tokens"] or 0 for span in spans),
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p95_ms": percentile(latencies, 0.95),
+            })
+        return rows
+
+    def export_jsonl(self, path):
+        """Writes every recorded span as one JSON line, returning how many were written"""
+        spans = self.spans()
+        with open(path, "w") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+        return len(spans)
+
+
+tracer = Tracer()
+
+
+def trace(kind, call_site, model=None, **attributes):
+    """Shorthand for tracer.span on the shared tracer"""
+    return tracer.span(kind, call_site, model, **attributes)
+
+
+def record_cache_hit(kind, call_site, model=None, **attributes):
+    """Records a call that was answered from a cache without reaching the service"""
+    span = Span(kind, call_site, model, **attributes)
+    span.latency_ms = 0.0
+    span.cache_hit = True
+    tracer.add(span)
+
+
+def render_sidebar_panel():
+    """Shows the per-call-site summary in the Streamlit sidebar with a JSONL download"""
+    import streamlit as st
+
+    with st.sidebar.expander("Call tracing"):
+        rows = tracer.summary()
+        if not rows:
+            st.caption("No calls traced yet")
+            return
+        st.dataframe(rows, hide_index=True)
+
+        # Queue depth and circuit state of the request governor, latency per call site and routed model
+        from governor import governor
+        from routing import router
+        st.dataframe(governor.metrics(), hide_index=True)
+        st.dataframe(router.stats(), hide_index=True)
+        st.download_button(
+            label="Export spans (JSONL)",
+            data="".join(json.dumps(span) + "\n" for span in tracer.spans()),
+            file_name="trace.jsonl",
+            mime="application/jsonl",
+        )
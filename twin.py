@@ -1,67 +1,45 @@
 import json
-import openai
-from openai import OpenAI
 import os
-from duckduckgo_search import  DDGS
 import textwrap
-from itertools import islice
-import firebase_admin
-from firebase_admin import credentials, firestore
-import streamlit as st 
+import time
+from resources import get_firestore, get_openai_client
+from profile_cache import get_profile, invalidate_profile
+from search import search_web
+from profile_index import get_profile_index
+from profile_render import remember_rendering, render_selection, split_rendering
+from recommendation_cache import recommendation_cache
+from tracing import record_cache_hit, trace
+from routing import completion_options, router
+from tokens import count_tokens
 
 
-firebase_config = st.secrets["firebase"]
-
-
-# Setting up firebase
-cred = credentials.Certificate(dict(firebase_config))
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
-
-
-
-# fetching the api key 
-openai_key = st.secrets["api"]["key"]
-
 # defining function to load profile
-def load_user_profile():
-    """Loads and parses the user profile from Firebase"""
-    doc_ref = db.collection("profiles").document("current_user")
-    doc = doc_ref.get()
-
-    if doc.exists:
-        print("Profile loaded from Firebase")
-        return doc.to_dict()
-    else:
-        print("No profile found in Firebase")
-        return {}
+def load_user_profile(user_id="current_user", use_cache=True):
+    """Loads and parses a user's profile from Firebase, served from the profile cache"""
+    if not use_cache:
+        invalidate_profile(doc_id=user_id)
+    # The stored prompt rendering is kept aside so it is not rendered again
+    profile, rendering = split_rendering(get_profile(get_firestore(), doc_id=user_id))
+    remember_rendering(profile, rendering)
+    return profile
 
 
 
-# Searching web for getting updated results
-def search_web(query, max_results=3):
-    with DDGS() as ddgs:
-        results = islice(ddgs.text(query), max_results)
-        return list(results)
-
-# Defining function for generating recommendations
-def generate_recommendations(user_profile, user_query):
-    """
-    Generates 3 personalized recommendations using:
-    1. User profile data
-    2. The specific query
-    3. Fresh web search results
-    """
+# Building the recommendation prompt
+def _build_recommendation_messages(user_profile, user_query):
+    """Searches the web for context and returns the chat messages for the recommendation call"""
     # Geting current web context
     search_results = search_web(f"{user_query} recommendations 2023")
+
+    # Sending only the profile facets relevant to this query, in their compact rendering
+    relevant_paths = get_profile_index(user_profile).select_paths(user_query)
+    relevant_profile = render_selection(user_profile, relevant_paths)
     
     prompt = f"""
     **Task**: Generate exactly 3 highly personalized recommendations based on:
     
     **User Profile**:
-    {json.dumps(user_profile, indent=2)}
+    {relevant_profile}
     
     **User Query**:
     "{user_query}"
@@ -85,19 +63,101 @@ def generate_recommendations(user_profile, user_query):
     Generate your response:
     """
 
-    # Setting up LLM
-    client = OpenAI(api_key=openai_key)
-
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You're a recommendation engine that creates hyper-personalized suggestions."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7  
-    )
+    return [
+        {"role": "system", "content": "You're a recommendation engine that creates hyper-personalized suggestions."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _estimate_tokens(messages):
+    """Estimates prompt plus completion tokens of a recommendation call for the rate limiter"""
+    return sum(count_tokens(message["content"]) for message in messages) + 500
+
+# Defining function for generating recommendations
+def generate_recommendations(user_profile, user_query):
+    """
+    Generates 3 personalized recommendations using:
+    1. User profile data
+    2. The specific query
+    3. Fresh web search results
+    """
+    # Reusing recommendations for the same or a rephrased query
+    cached = recommendation_cache.get(user_profile, user_query)
+    if cached is not None:
+        record_cache_hit("llm", "recommendations.generate", "gpt-4")
+        return cached
+
+    messages = _build_recommendation_messages(user_profile, user_query)
+
+    # Using the shared LLM client
+    client = get_openai_client()
+
+    with trace("llm", "recommendations.generate", "gpt-4") as span:
+        response = router.call(
+            "recommendations",
+            lambda model, route: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                **completion_options(route)
+            ),
+            estimated_tokens=_estimate_tokens(messages),
+            span=span
+        )
+        span.set_usage(response.usage)
     
-    return response.choices[0].message.content
+    recommendations = response.choices[0].message.content
+    recommendation_cache.set(user_profile, user_query, recommendations)
+    return recommendations
+
+# Defining streaming variant for progressive rendering
+def stream_recommendations(user_profile, user_query):
+    """
+    Same as generate_recommendations, but yields the text in chunks as GPT-4
+    produces them instead of waiting for the whole completion.
+    """
+    # Reusing recommendations for the same or a rephrased query
+    cached = recommendation_cache.get(user_profile, user_query)
+    if cached is not None:
+        record_cache_hit("llm", "recommendations.stream", "gpt-4")
+        yield cached
+        return
+
+    messages = _build_recommendation_messages(user_profile, user_query)
+
+    # Using the shared LLM client
+    client = get_openai_client()
+
+    # The span covers the whole stream, the time to first token is kept separately
+    with trace("llm", "recommendations.stream", "gpt-4") as span:
+        start = time.perf_counter()
+        # Only opening the stream is retried, not a failure halfway through it
+        stream = router.call(
+            "recommendations",
+            lambda model, route: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True},
+                **completion_options(route)
+            ),
+            estimated_tokens=_estimate_tokens(messages),
+            span=span
+        )
+
+        recommendations = ""
+        for chunk in stream:
+            if chunk.usage is not None:
+                span.set_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not recommendations:
+                    span.attributes["first_token_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                recommendations += chunk.choices[0].delta.content
+                yield chunk.choices[0].delta.content
+
+    # An empty stream would otherwise be served from the cache until it expires
+    if recommendations:
+        recommendation_cache.set(user_profile, user_query, recommendations)
 
 # def save_recommendations(recommendations, filename="personalized_recommendations.txt"):
 #     """Saves recommendations with nice formatting"""
@@ -1,31 +1,80 @@
 import json
-import openai
 import os
-from openai import OpenAI
-from firebase_admin import credentials, firestore
-import firebase_admin
-import streamlit as st
+import re
+import threading
 from collections import defaultdict
-
-# Load Firebase credentials from Streamlit secrets
-firebase_config = st.secrets["firebase"]
-
-# Initialize Firebase
-cred = credentials.Certificate(dict(firebase_config))
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-# Load OpenAI API key
-openai_key = st.secrets["api"]["key"]
-
-
-# Function to summarize a specific phase
-def generate_phase_summary(phase, data):
-    """
-    Generates a summary/profile from a specific phase of interview data using GPT-4.
-    """
-    prompt = f"""
+from profile_cache import invalidate_profile
+from conversation_store import load_conversation
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache import SQLiteTTLCache, content_hash
+from routing import completion_options, router
+from resources import get_firestore, get_openai_client
+from profile_merge import merge_summaries, normalize_value, reduce_hierarchically
+from profile_render import RENDERING_FIELD, remember_rendering, render_profile
+from tokens import count_tokens
+from tracing import trace
+
+
+# Primary model for phase summaries and its limits, see routing.ROUTES for fallbacks
+SUMMARY_MODEL = "gpt-3.5-turbo-16k"
+SUMMARY_CONTEXT_TOKENS = 16385
+# Room kept free in the context window for the JSON summary
+SUMMARY_OUTPUT_RESERVE = 4096
+# Target size of the interview data sent in one summary call
+CHUNK_TOKEN_BUDGET = 3000
+# A chunk at least this full ends before an anchor question, see _is_anchor
+ANCHOR_MIN_FILL = 0.5
+ANCHOR_EVERY = 2
+# Largest merged phase summary kept as is, bigger ones are condensed by the LLM
+MERGED_PHASE_TOKEN_LIMIT = 1500
+# How many summaries one condense call merges at most
+MERGE_FAN_IN = 4
+
+SUMMARY_SYSTEM_PROMPT = "You are a professional profile summarizer."
+# Bumped whenever the summary prompt changes, so memoized summaries are redone
+PROMPT_VERSION = 1
+
+# Models that accept response_format={"type": "json_object"}
+JSON_MODE_MODEL_PREFIXES = (
+    "gpt-4o", "gpt-4-turbo", "gpt-4.1", "gpt-4-1106", "gpt-4-0125",
+    "gpt-3.5-turbo-1106", "gpt-3.5-turbo-0125",
+)
+
+# Replies that are not valid JSON are asked for again this many times
+PARSE_ATTEMPTS = 2
+# Completion tokens reserved in the rate limiter per summary call
+SUMMARY_OUTPUT_ESTIMATE = 1024
+
+# Where finished chunk summaries are kept, so a failed build only redoes the rest
+# and a retaken interview only re-summarizes the chunks whose answers changed
+CHECKPOINT_PATH = "profile_checkpoints.sqlite3"
+CHECKPOINT_TTL = 30 * 24 * 60 * 60
+CHECKPOINT_MAX_ENTRIES = 5000
+
+_checkpoints = None
+_checkpoints_lock = threading.Lock()
+
+
+def set_checkpoint_store(store):
+    """Replaces the checkpoint store, e.g. with an in-memory TTLCache in benchmarks"""
+    global _checkpoints
+    with _checkpoints_lock:
+        _checkpoints = store
+
+
+def _get_checkpoints():
+    """Opens the on-disk checkpoint store on first use"""
+    global _checkpoints
+    with _checkpoints_lock:
+        if _checkpoints is None:
+            _checkpoints = SQLiteTTLCache(
+                CHECKPOINT_PATH, ttl=CHECKPOINT_TTL, max_entries=CHECKPOINT_MAX_ENTRIES
+            )
+        return _checkpoints
+
+
+def _summary_prompt(phase, data):
+    return f"""
     Create a structured JSON summary for the following interview phase: "{phase}".
     Summarize the key ideas, values, stories, and personal characteristics discussed.
     Use clear groupings like background, personality traits, preferences, life lessons, etc.
@@ -35,18 +84,44 @@ def generate_phase_summary(phase, data):
     {json.dumps(data, indent=2)}
     """
 
-    client = OpenAI(api_key=openai_key)
 
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo-16k",
-        messages=[
-            {"role": "system", "content": "You are a professional profile summarizer."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3
-    )
+def _json_mode(model):
+    """Returns the request options asking the model for a JSON object, if it supports that"""
+    if model.startswith(JSON_MODE_MODEL_PREFIXES):
+        return {"response_format": {"type": "json_object"}}
+    return {}
 
-    return response.choices[0].message.content
+
+# Function to summarize a specific phase
+def generate_phase_summary(phase, data):
+    """
+    Generates a summary/profile from a specific phase of interview data and
+    returns it with the model the router used.
+    """
+    prompt = _summary_prompt(phase, data)
+
+    client = get_openai_client()
+
+    with trace("llm", "profile.phase_summary", SUMMARY_MODEL, phase=phase, entries=len(data)) as span:
+        # The router picks the model, the governor handles rate limits and retries
+        response = router.call(
+            "profile.phase_summary",
+            lambda model, route: client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                **_json_mode(model),
+                **completion_options(route)
+            ),
+            estimated_tokens=count_tokens(prompt, SUMMARY_MODEL) + SUMMARY_OUTPUT_ESTIMATE,
+            span=span
+        )
+        span.set_usage(response.usage)
+
+    return response.choices[0].message.content, span.model
 
 
 # Function to break data by phase and summarize each
@@ -83,41 +158,351 @@ def generate_phase_summary(phase, data):
 
 
 
-def generate_full_profile_by_phase(interview_data, chunk_size=4):
+# Parsing the JSON returned by the summarizer
+def _parse_summary(summary_text):
     """
-    Splits interview data by phase, chunks large phases, summarizes each chunk,
-    and combines summaries into a full profile.
+    Parses a summary response. Code fences and text around the JSON object are
+    ignored and trailing commas are dropped; raises ValueError if no object is left.
+    """
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", (summary_text or "").strip())
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find('{')
+    if start == -1:
+        raise ValueError("No JSON object in summary response")
+    candidate = text[start:text.rfind('}') + 1]
+    for attempt in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+        try:
+            # raw_decode stops at the end of the first object
+            return json.JSONDecoder().raw_decode(attempt)[0]
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("Summary response is not valid JSON")
+
+
+def _checkpoint_key(phase, chunk, model):
+    return content_hash({
+        "phase": phase, "entries": chunk, "prompt_version": PROMPT_VERSION, "model": model
+    })
+
+
+def _load_checkpoint(checkpoints, phase, chunk):
+    """
+    Returns a checkpointed summary made by any model of the summary route, so a
+    fallback model's summary is reused but a model taken out of the route is not
+    """
+    for model in router.route("profile.phase_summary")["models"]:
+        summary = checkpoints.get(_checkpoint_key(phase, chunk, model))
+        if summary is not None:
+            return summary
+    return None
+
+
+# Summarizing a single chunk of a phase
+def _summarize_chunk(phase, chunk):
+    """
+    Summarizes one chunk of interview entries and returns the parsed JSON.
+    Unparseable replies are asked for again, and the result is checkpointed
+    so a rebuild does not summarize it again.
     """
+    checkpoints = _get_checkpoints()
+    summary = _load_checkpoint(checkpoints, phase, chunk)
+    if summary is not None:
+        return summary
+
+    for attempt in range(PARSE_ATTEMPTS):
+        try:
+            summary_text, model = generate_phase_summary(phase, chunk)
+            summary = _parse_summary(summary_text)
+            break
+        except ValueError as e:
+            if attempt == PARSE_ATTEMPTS - 1:
+                raise
+            print(f"Summary of a chunk of {phase} was not valid JSON ({e}), asking again")
+
+    checkpoints.set(_checkpoint_key(phase, chunk, model), summary)
+    return summary
+
+
+def _group_by_phase(interview_data):
+    """Groups interview entries by phase, keeping the interview order"""
     phase_data = defaultdict(list)
     for item in interview_data:
         phase = item.get("phase", "Miscellaneous")
         phase_data[phase].append(item)
+    return phase_data
+
+
+def _chunk_entries(entries, chunk_size):
+    """Splits a phase's entries into consecutive chunks of chunk_size"""
+    return [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+
+
+def _entry_tokens(entry):
+    """Counts the tokens an entry adds to the Interview Data list of the prompt"""
+    return count_tokens(json.dumps(entry, indent=2), SUMMARY_MODEL) + 2
+
+
+def _prompt_overhead(phase):
+    """Counts the tokens of the prompt around the interview data"""
+    return (count_tokens(_summary_prompt(phase, []), SUMMARY_MODEL)
+            + count_tokens(SUMMARY_SYSTEM_PROMPT, SUMMARY_MODEL) + 8)
+
+
+def _fit_entry(entry, token_limit):
+    """Shortens the answer of an entry too large for a single call"""
+    tokens = _entry_tokens(entry)
+    if tokens <= token_limit:
+        return entry
+    answer = entry.get("answer", "")
+    keep = max(0, int(len(answer) * token_limit / tokens) - 16)
+    print(f"Truncating an answer of {tokens} tokens to fit the summary context")
+    return dict(entry, answer=answer[:keep])
 
-    full_profile = {}
-
-    for phase, entries in phase_data.items():
-        print(f"Summarizing phase: {phase}")
-
-        # Chunk long phases
-        chunked_summaries = []
-        for i in range(0, len(entries), chunk_size):
-            chunk = entries[i:i + chunk_size]
-            print(f"  Summarizing chunk {i//chunk_size + 1} of {phase}...")
-            try:
-                summary_text = generate_phase_summary(phase, chunk)
-                summary_json = json.loads(summary_text)
-            except json.JSONDecodeError:
-                start = summary_text.find('{')
-                end = summary_text.rfind('}') + 1
-                summary_json = json.loads(summary_text[start:end])
-            chunked_summaries.append(summary_json)
-
-        # Combine chunk summaries into a single summary for the phase
-        full_profile[phase] = {
-            f"part_{idx+1}": chunk for idx, chunk in enumerate(chunked_summaries)
+
+def _is_anchor(question):
+    """Picks questions that start a new chunk, independently of the answers"""
+    return int(content_hash(question)[:8], 16) % ANCHOR_EVERY == 0
+
+
+def _chunk_entries_by_tokens(phase, entries, token_budget):
+    """
+    Packs consecutive entries into few chunks without going over token_budget,
+    which is capped so every prompt fits the summary model.
+
+    Chunks that are half full also end before anchor questions. Those cut
+    points do not move when an answer changes, so after an edit the chunks
+    past the next anchor are the same as before and their summaries are reused.
+    """
+    limit = SUMMARY_CONTEXT_TOKENS - SUMMARY_OUTPUT_RESERVE - _prompt_overhead(phase)
+    budget = min(token_budget, limit)
+
+    chunks = []
+    chunk, chunk_tokens = [], 0
+    for entry in entries:
+        entry = _fit_entry(entry, limit)
+        tokens = _entry_tokens(entry)
+        # Follow-up answers share their question and stay with its first answer
+        new_question = not chunk or chunk[-1].get("question") != entry.get("question")
+        anchored = (new_question and _is_anchor(entry.get("question", ""))
+                    and chunk_tokens >= budget * ANCHOR_MIN_FILL)
+        # A single entry over the budget still gets a call of its own
+        if chunk and (chunk_tokens + tokens > budget or anchored):
+            chunks.append(chunk)
+            chunk, chunk_tokens = [], 0
+        chunk.append(entry)
+        chunk_tokens += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+# Condensing summaries with the LLM
+def _condense_summaries(phase, summaries):
+    """Asks the LLM to merge summaries into one, keeping the structural merge if it fails"""
+    merged = merge_summaries(summaries)
+    prompt = f"""
+    Condense the following JSON summary of the interview phase "{phase}".
+    Merge overlapping groups and entries that say the same thing, drop repetition,
+    and keep every distinct fact, value, story and preference.
+    Use short snake_case keys. Return only valid JSON without any extra commentary.
+
+    Summary:
+    {json.dumps(merged, separators=(",", ":"))}
+    """
+
+    client = get_openai_client()
+
+    with trace("llm", "profile.condense", SUMMARY_MODEL, phase=phase, parts=len(summaries)) as span:
+        response = router.call(
+            "profile.condense",
+            lambda model, route: client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                **completion_options(route)
+            ),
+            estimated_tokens=count_tokens(prompt, SUMMARY_MODEL) + SUMMARY_OUTPUT_ESTIMATE,
+            span=span
+        )
+        span.set_usage(response.usage)
+
+    try:
+        return normalize_value(_parse_summary(response.choices[0].message.content))
+    except ValueError:
+        print(f"Failed to parse condensed summary of {phase}, keeping the merged one")
+        return merged
+
+
+def merge_phase(phase, summaries, condense=True, token_limit=MERGED_PHASE_TOKEN_LIMIT):
+    """
+    Reduces the chunk summaries of a phase to one deduplicated summary. They are
+    merged locally first; only a result over token_limit is condensed by the
+    LLM, MERGE_FAN_IN summaries at a time.
+    """
+    merged = merge_summaries(summaries)
+    if not condense or count_tokens(json.dumps(merged), SUMMARY_MODEL) <= token_limit:
+        return merged
+    try:
+        if len(summaries) == 1:
+            return _condense_summaries(phase, summaries)
+        return reduce_hierarchically(
+            summaries, lambda group: _condense_summaries(phase, group), MERGE_FAN_IN
+        )
+    except Exception as e:
+        # Every chunk is summarized by now, so a failed condense should not fail the build
+        print(f"Failed to condense {phase} ({type(e).__name__}: {e}), keeping the merged summary")
+        return merged
+
+
+# Defining incremental profile builder
+class ProfileBuilder:
+    """
+    Summarizes interview phases in the background as soon as they are finished,
+    so that only the last phase is still outstanding when the interview ends.
+    Phases are chunked by token count unless a fixed chunk_size is given, and
+    with merge the chunk summaries of each phase are reduced to one summary.
+    A shared executor can be passed in; it is left running on close.
+    """
+
+    def __init__(self, chunk_size=None, max_workers=8, token_budget=CHUNK_TOKEN_BUDGET, merge=True,
+                 executor=None):
+        self.chunk_size = chunk_size
+        self.token_budget = token_budget
+        self.merge = merge
+        self.max_workers = max(1, max_workers)
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=self.max_workers)
+        self.phase_jobs = {}
+        self._closed = False
+
+    def _summarize(self, phase, chunk):
+        """Summarizes a chunk unless the builder was closed while it was queued"""
+        if self._closed:
+            raise RuntimeError("The profile builder was closed")
+        return _summarize_chunk(phase, chunk)
+
+    def submit_phase(self, phase, entries):
+        """Starts summarizing a finished phase unless the same entries are already queued"""
+        job = self.phase_jobs.get(phase)
+        if not entries or (job is not None and job["entries"] == entries):
+            return
+        if self.chunk_size:
+            chunks = _chunk_entries(entries, self.chunk_size)
+        else:
+            chunks = _chunk_entries_by_tokens(phase, entries, self.token_budget)
+        print(f"Queued phase for summarizing: {phase} ({len(chunks)} chunks)")
+        self.phase_jobs[phase] = {
+            "entries": list(entries),
+            "chunks": chunks,
+            "futures": [self.executor.submit(self._summarize, phase, chunk) for chunk in chunks],
         }
 
-    return json.dumps(full_profile, indent=2)
+    def _resubmit_failed(self, phase):
+        """Queues the chunks of a phase that failed in an earlier build again"""
+        job = self.phase_jobs[phase]
+        for idx, future in enumerate(job["futures"]):
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                job["futures"][idx] = self.executor.submit(self._summarize, phase, job["chunks"][idx])
+
+    def build(self, interview_data, progress=None):
+        """
+        Summarizes any phases not yet submitted and returns the full profile JSON.
+        Raises once every chunk has finished if any of them failed; calling it
+        again only redoes the failed chunks. progress(done, total, phase) is
+        called as chunks finish.
+        """
+        phase_data = _group_by_phase(interview_data)
+        for phase, entries in phase_data.items():
+            self.submit_phase(phase, entries)
+            self._resubmit_failed(phase)
+
+        positions = {}
+        for phase in phase_data:
+            for idx, future in enumerate(self.phase_jobs[phase]["futures"]):
+                positions[future] = (phase, idx)
+        total = len(positions)
+        print(f"Summarizing {len(phase_data)} phases in {total} chunks "
+              f"(max {self.max_workers} in flight)")
+        if progress is not None:
+            progress(0, total, None)
+
+        # Waiting on results as they finish, keyed by their original position
+        results = {}
+        errors = []
+        for done, future in enumerate(as_completed(positions), start=1):
+            phase, idx = positions[future]
+            if progress is not None:
+                progress(done, total, phase)
+            if future.exception() is not None:
+                errors.append(future.exception())
+                print(f"  [{done}/{total}] Failed chunk {idx + 1} of {phase}: {future.exception()}")
+                continue
+            results[(phase, idx)] = future.result()
+            print(f"  [{done}/{total}] Summarized chunk {idx + 1} of {phase}")
+
+        if errors:
+            raise RuntimeError(
+                f"{len(errors)} of {total} chunks could not be summarized, "
+                f"the other {total - len(errors)} are checkpointed"
+            ) from errors[0]
+
+        # Combine chunk summaries into a single summary per phase
+        full_profile = {}
+        for phase in phase_data:
+            chunk_count = len(self.phase_jobs[phase]["futures"])
+            full_profile[phase] = {
+                f"part_{idx+1}": results[(phase, idx)] for idx in range(chunk_count)
+            }
+
+        if self.merge:
+            # Merging phases concurrently since large ones may need condense calls
+            merges = {
+                phase: self.executor.submit(merge_phase, phase, list(parts.values()))
+                for phase, parts in full_profile.items()
+            }
+            full_profile = {phase: future.result() for phase, future in merges.items()}
+
+        return json.dumps(full_profile, indent=2)
+
+    def close(self):
+        """
+        Releases the worker threads without waiting on pending chunks. Queued
+        chunks fail without an LLM call instead of being cancelled, because a
+        cancelled future never wakes a build waiting on it.
+        """
+        self._closed = True
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+def generate_full_profile_by_phase(interview_data, chunk_size=None, max_workers=8,
+                                   token_budget=CHUNK_TOKEN_BUDGET, merge=True):
+    """
+    Splits interview data by phase, chunks large phases, summarizes each chunk,
+    and combines summaries into a full profile.
+
+    Chunks hold as many answers as fit in token_budget prompt tokens, counted
+    with the local tokenizer; passing chunk_size uses a fixed number of answers.
+    With merge the parts of each phase are reduced to a single summary,
+    otherwise they are kept as part_1..part_N.
+
+    Chunks of all phases are summarized concurrently on a thread pool with at
+    most max_workers requests in flight; max_workers=1 runs them one by one.
+    """
+    builder = ProfileBuilder(
+        chunk_size=chunk_size, max_workers=max_workers, token_budget=token_budget, merge=merge
+    )
+    try:
+        return builder.build(interview_data)
+    finally:
+        builder.close()
 
 
 
@@ -127,28 +512,40 @@ def save_profile(profile_json, collection="profiles", doc_id="current_user"):
     """Saves the user profile JSON to Firebase Firestore"""
     try:
         profile_data = json.loads(profile_json)
-        db.collection(collection).document(doc_id).set(profile_data)
+        # Storing the compact prompt rendering next to the profile it was made from
+        rendering = render_profile(profile_data)
+        with trace("firestore", "profile.save"):
+            get_firestore().collection(collection).document(doc_id).set(
+                dict(profile_data, **{RENDERING_FIELD: rendering})
+            )
+        remember_rendering(profile_data, rendering)
+        # Cached recommendations are keyed by profile version, so other users' stay valid
+        invalidate_profile(collection, doc_id)
         print(f"Profile saved to Firebase (collection: {collection}, doc: {doc_id})")
+        return True
     except Exception as e:
         print(f"Failed to save profile: {e}")
+        return False
 
 
 # Main logic
 if __name__ == "__main__":
-    # Fetch conversation data from Firestore
-    doc_ref = db.collection("conversations").document("full_conversation")
-    doc = doc_ref.get()
+    # Fetch conversation data from Firestore, optionally for the user given on the command line
+    import sys
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    if user_id:
+        interview_data = load_conversation(get_firestore(), doc_id=user_id)
+    else:
+        interview_data = load_conversation(get_firestore())
 
-    if doc.exists:
-        interview_data = doc.to_dict().get("conversation")
+    if interview_data:
         print("Loaded conversation from Firebase")
     else:
         print("No conversation found in Firebase")
-        interview_data = []
 
     # Generate full profile from phase-wise summaries
     print("Generating profile...")
     cleaned_profile = generate_full_profile_by_phase(interview_data)
 
     # Save the profile
-    save_profile(cleaned_profile)
+    save_profile(cleaned_profile, doc_id=user_id or "current_user")